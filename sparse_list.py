@@ -10,8 +10,22 @@ default) and for reasons of memory efficiency you don't wish to store these.
 cf. Sparse array:
 
     http://en.wikipedia.org/wiki/Sparse_array
+
+Importing this module stays cheap: anything heavier than the core of the
+standard library (shared memory, pickling, NumPy) is imported on first use.
+Set SPARSE_LIST_PURE_PYTHON in the environment to keep optional dependencies
+such as NumPy from being imported at all.
 '''
 
+from array import array, typecodes
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+from functools import partial, reduce
+from itertools import accumulate, compress, islice, repeat
+import operator
+import os
+import sys
+
 
 class SparseList(object):
     '''
@@ -19,16 +33,200 @@ class SparseList(object):
     stores the data in a dictionary to conserve memory.
     '''
 
-    def __init__(self, arg, default_value=None):
+    # With storage='auto', the populated fraction at which the layout switches
+    # from a dict to a bitmap, and from a bitmap to a dense list
+    BITMAP_DENSITY = 1 / 64
+    DENSE_DENSITY = 3 / 4
+
+    # With compact_below, the smallest peak population worth compacting after
+    COMPACT_MINIMUM = 256
+
+    # The most aggregate indexes range_aggregate() keeps at once, dropping the
+    # least recently queried
+    AGGREGATE_CACHE = 4
+
+    def __init__(self, arg, default_value=None, is_default=None, identity=False, typecode=None,
+                 storage='dict', sorted_values=False, compact_below=None):
+        '''
+        By default a value is treated as the default (and so not stored) when
+        it compares equal to default_value. Alternatively:
+
+        identity -- a value is the default only if it *is* default_value
+        is_default -- a predicate deciding whether a value is the default
+        typecode -- values are numbers of this array typecode; bulk loads are
+                    converted and filtered through an array.array
+
+        storage selects how the populated elements are held: 'dict', 'bitmap'
+        (an occupancy bitmap with values packed in index order), 'dense' (a
+        list with a slot for every index), 'chunked' (blocks of 4096 indices,
+        each a dict or a dense list by its fill, suited to huge lists with
+        clustered values) or 'auto', which picks one of the first three by
+        density whenever the list is loaded or extended in bulk.
+
+        With sorted_values, the populated values must be in ascending order of
+        index (a ValueError is raised by any write that would break this),
+        and index(), membership and bisection take logarithmic time.
+
+        With compact_below, the storage is compacted automatically whenever
+        removals leave the population below that fraction of its peak since
+        the last compaction.
+        '''
+        if sum((identity, is_default is not None, typecode is not None)) > 1:
+            raise ValueError('Only one of is_default, identity and typecode may be given')
+        if storage != 'auto' and storage not in _LAYOUTS:
+            raise ValueError('Unknown storage: {}'.format(storage))
+        if typecode is not None:
+            default_value = array(typecode, (default_value,))[0]
+        if identity:
+            is_default = partial(operator.is_, default_value)
+        elif is_default is None:
+            is_default = partial(operator.eq, default_value)
         self.default = default_value
+        self.typecode = typecode
+        self.storage = storage
+        self.sorted_values = sorted_values
+        self.compact_below = compact_below
+        self._peak = 0
+        self._is_default = is_default
         self.elements = {}
         self.size = 0
+        self.__reset_index()
         if isinstance(arg, int):
             self.size = int(arg)
         elif isinstance(arg, dict):
             self.__initialise_from_dict(arg)
+        elif typecode is not None:
+            self.__initialise_from_typed_iterable(arg)
         else:
             self.__initialise_from_iterable(arg)
+        if storage != 'dict':
+            self.__adopt(self.elements)
+
+    @property
+    def layout(self):
+        '''
+        the storage layout in use: 'dict', 'bitmap', 'dense' or 'chunked'
+        '''
+        return _LAYOUT_NAMES[type(self.elements)]
+
+    def __adopt(self, elements):
+        '''
+        install a mapping of populated elements as this list's storage,
+        converting it to the layout selected by self.storage
+        '''
+        layout = self.storage
+        if layout == 'auto':
+            density = len(elements) / self.size if self.size else 0
+            if density < self.BITMAP_DENSITY:
+                layout = 'dict'
+            elif density < self.DENSE_DENSITY:
+                layout = 'bitmap'
+            else:
+                layout = 'dense'
+        if layout == 'dict':
+            if not isinstance(elements, dict):
+                elements = dict(elements.items())
+        elif type(elements) is not _LAYOUTS[layout]:
+            elements = _LAYOUTS[layout](elements.items(), self.typecode)
+        if elements is not self.elements:
+            self.elements = elements
+            self.__reset_index()
+            if self.sorted_values:
+                self.__check_sorted()
+
+    def __replace(self, elements):
+        '''
+        install a new mapping of populated elements in place of the current
+        storage, which is restored if the new one breaks sorted_values
+        '''
+        previous = self.elements
+        self.elements = None
+        try:
+            self.__adopt(elements)
+        except ValueError:
+            self.elements = previous
+            self.__reset_index()
+            raise
+
+    def __empty_like(self, size=0):
+        '''
+        return an empty SparseList of the given size that shares this one's
+        default and default-detection policy
+        '''
+        result = self.__class__(size, self.default, storage=self.storage, sorted_values=self.sorted_values,
+                                compact_below=self.compact_below)
+        result.typecode = self.typecode
+        result._is_default = self._is_default
+        return result
+
+    def __reset_index(self):
+        '''
+        forget the ordered index of populated indices and any aggregate trees
+        built over it; they are rebuilt on demand, except that a list with
+        sorted_values always keeps its ordered index
+        '''
+        self._ordered = sorted(self.elements) if self.sorted_values else None
+        self._aggregates = {}
+
+    def __check_sorted(self):
+        values = self.__values_in_order()
+        if any(map(operator.lt, islice(values, 1, None), values)):
+            raise ValueError('SparseList values are not sorted')
+
+    def __check_order(self, index, value):
+        '''
+        Raises ValueError unless value fits between the populated values
+        either side of index.
+        '''
+        elements = self.elements
+        ordered = self._ordered
+        below = bisect_left(ordered, index) - 1
+        above = below + 2 if below + 1 < len(ordered) and ordered[below + 1] == index else below + 1
+        if (below >= 0 and value < elements[ordered[below]]) or (
+                above < len(ordered) and elements[ordered[above]] < value):
+            raise ValueError('{} at {} would break the sorted order of values'.format(value, index))
+
+    def __values_in_order(self):
+        return _ValuesInOrder(self.elements, self._sorted_keys())
+
+    def _sorted_keys(self):
+        '''
+        return the populated indices in ascending order. Once built, this index
+        is maintained by subsequent writes.
+        '''
+        if self._ordered is None:
+            self._ordered = sorted(self.elements)
+        return self._ordered
+
+    def __index_store(self, index, value):
+        '''
+        store a non-default value, keeping the ordered index and aggregate
+        trees up to date
+        '''
+        elements = self.elements
+        ordered = self._ordered
+        aggregates = self._aggregates.values()
+        if self.sorted_values:
+            self.__check_order(index, value)
+        if index not in elements:
+            if not ordered or index > ordered[-1]:
+                ordered.append(index)
+            else:
+                insort(ordered, index)
+        elements[index] = value
+        for tree in aggregates:
+            tree.store(index, value)
+
+    def __index_discard(self, index):
+        '''
+        remove a populated index, keeping the ordered index and aggregate trees
+        up to date
+        '''
+        del self.elements[index]
+        ordered = self._ordered
+        del ordered[bisect_left(ordered, index)]
+        for tree in self._aggregates.values():
+            tree.discard(index)
 
     def __len__(self):
         return self.size
@@ -37,32 +235,222 @@ class SparseList(object):
         return len(self.elements)
 
     def __setitem__(self, index, value):
-        try:
-            if index.start:
-                self.size = max(self.size, index.start + len(value))
-            s = slice(index.start, index.stop, index.step).indices(self.size)
-            for v, i in enumerate(range(*s)):
-                self.__setitem__(i, value[v])
-        except AttributeError:
-            if value != self.default:
+        if type(index) is not int:
+            if isinstance(index, slice):
+                size = self.size
+                if index.start and len(value) and (index.step or 1) > 0:
+                    self.size = max(self.size, index.start + len(value))
+                indices = range(*index.indices(self.size))
+                try:
+                    self.update_arrays(indices, [value[v] for v in range(len(indices))])
+                except Exception:
+                    self.size = size
+                    raise
+                return
+            index = operator.index(index)
+        if index < 0:
+            index += self.size
+            if index < 0:
+                raise IndexError('SparseList assignment index out of range')
+        if self.typecode is not None:
+            value = array(self.typecode, (value,))[0]
+        if not self._is_default(value):
+            if self._ordered is None:
                 self.elements[index] = value
-            self.size = max(index + 1, self.size)
+            else:
+                self.__index_store(index, value)
+        elif index in self.elements:
+            if self._ordered is None:
+                del self.elements[index]
+            else:
+                self.__index_discard(index)
+            if self.compact_below is not None:
+                self.__shrunk(len(self.elements) + 1)
+        if index >= self.size:
+            self.size = index + 1
 
     def __getitem__(self, index):
-        try:
-            s = slice(index.start, index.stop, index.step).indices(self.size)
-            indices = range(*s)
-            sl = SparseList(
-                {
-                    k: self.elements[i]
-                    for k, i in enumerate(indices)
-                    if i in self.elements
-                }, self.default)
-            sl.size = len(indices)
-            return sl
-        except AttributeError:
-            i = slice(index).indices(self.size)[1]
-            return self.elements.get(i, self.default)
+        if type(index) is not int:
+            if isinstance(index, slice):
+                indices = range(*index.indices(self.size))
+                sl = self.__empty_like(len(indices))
+                if indices.step < 0:
+                    sl.sorted_values = False
+                sl.__adopt(self.__slice_elements(indices))
+                return sl
+            index = operator.index(index)
+        size = self.size
+        if index < 0:
+            index += size
+            if index < 0:
+                raise IndexError('SparseList index out of range')
+        elif index >= size:
+            raise IndexError('SparseList index out of range')
+        return self.elements.get(index, self.default)
+
+    def __slice_elements(self, indices):
+        '''
+        return a dict of the populated elements at a range of indices, keyed by
+        position in the range, probing each index or scanning the populated
+        ones, whichever is fewer
+        '''
+        elements = self.elements
+        if len(indices) <= len(elements):
+            return {k: elements[i] for k, i in enumerate(indices) if i in elements}
+        if isinstance(elements, dict):
+            pairs = elements.items()
+        else:
+            lo, hi = (indices[0], indices[-1]) if indices.step > 0 else (indices[-1], indices[0])
+            pairs = elements.range_items(lo, hi + 1)
+        position = indices.index
+        return {position(i): v for i, v in pairs if i in indices}
+
+    def get_many(self, indices):
+        '''
+        return a list of the values at each of the given indices.
+        Raises IndexError if any index is out of range.
+        '''
+        indices = self.__normalise_many(indices)
+        return list(map(self.elements.get, indices, repeat(self.default)))
+
+    def __normalise_many(self, indices, extend=False):
+        '''
+        return a list of indices with negative ones counted back from the end.
+        Raises IndexError if any is out of range, except past the end when
+        extend is true.
+        '''
+        indices = list(map(operator.index, indices))
+        if not indices:
+            return indices
+        size = self.size
+        lowest = min(indices)
+        if lowest < -size or (not extend and max(indices) >= size):
+            raise IndexError('SparseList index out of range')
+        if lowest < 0:
+            indices = [i + size if i < 0 else i for i in indices]
+        return indices
+
+    def update(self, pairs):
+        '''
+        set many elements at once from a mapping or an iterable of
+        (index, value) pairs, as if by sl[index] = value for each
+        '''
+        if hasattr(pairs, 'items'):
+            pairs = pairs.items()
+        pairs = tuple(pairs)
+        self.update_arrays(map(operator.itemgetter(0), pairs), map(operator.itemgetter(1), pairs))
+
+    def update_arrays(self, indices, values):
+        '''
+        set many elements at once, as if by sl[index] = value for each index in
+        indices and corresponding value in values. All of the indices (and, for
+        a typed SparseList, the values) are validated before any is written.
+        '''
+        indices = self.__normalise_many(indices, extend=True)
+        if self.typecode is not None:
+            values = array(self.typecode, values)
+        elif not isinstance(values, (list, tuple)):
+            values = list(values)
+        if len(indices) != len(values):
+            raise ValueError('update_arrays() needs as many values as indices')
+        if not indices:
+            return
+        elements = self.elements
+        if self._ordered is None and isinstance(elements, dict) and not any(map(self._is_default, values)):
+            # nothing to clear and no index to maintain, so write straight
+            # through; as ever, the last write to each index wins
+            elements.update(zip(indices, values))
+        else:
+            stores = dict(zip(indices, values))
+            clears = list(compress(stores, map(self._is_default, stores.values())))
+            for k in clears:
+                del stores[k]
+            if self.sorted_values:
+                self.__check_batch_order(stores, set(clears))
+            self.__apply(stores, clears)
+        self.size = max(self.size, max(indices) + 1)
+        if self.storage == 'auto':
+            self.__adopt(self.elements)
+
+    def __check_batch_order(self, stores, clears):
+        '''
+        Raises ValueError unless storing a dict of values and clearing a set of
+        indices would leave the populated values in ascending order. Each
+        stored value is compared with its nearest untouched populated
+        neighbours, found by bisection, and with the next stored value.
+        '''
+        elements = self.elements
+        ordered = self._ordered
+        keys = sorted(stores)
+        last = len(keys) - 1
+        for n, index in enumerate(keys):
+            value = stores[index]
+            lower = keys[n - 1] if n else -1
+            upper = keys[n + 1] if n < last else self.size
+            below = bisect_left(ordered, index) - 1
+            while below >= 0 and ordered[below] > lower and (ordered[below] in stores or ordered[below] in clears):
+                below -= 1
+            above = bisect_right(ordered, index)
+            while above < len(ordered) and ordered[above] < upper and (
+                    ordered[above] in stores or ordered[above] in clears):
+                above += 1
+            if ((below >= 0 and ordered[below] > lower and value < elements[ordered[below]]) or
+                    (above < len(ordered) and ordered[above] < upper and elements[ordered[above]] < value) or
+                    (n < last and stores[upper] < value)):
+                raise ValueError('{} at {} would break the sorted order of values'.format(value, index))
+
+    def clear_many(self, indices):
+        '''
+        reset the elements at the given indices to the default, without
+        shifting the elements after them.
+        Raises IndexError if any index is out of range.
+        '''
+        self.__apply({}, self.__normalise_many(indices))
+        if self.storage == 'auto':
+            self.__adopt(self.elements)
+
+    def __apply(self, stores, clears):
+        '''
+        store a dict of non-default values and discard a collection of indices,
+        merging the changes into the ordered index if there is one
+        '''
+        elements = self.elements
+        ordered = self._ordered
+        if ordered is not None:
+            added = sorted(k for k in stores if k not in elements)
+        if isinstance(elements, dict):
+            elements.update(stores)
+        else:
+            for k, v in stores.items():
+                elements[k] = v
+        population = len(elements)
+        removed = {k for k in clears if k in elements}
+        for k in removed:
+            del elements[k]
+        if ordered is not None:
+            if (len(added) + len(removed)) * _BlockAggregate.BLOCK < len(ordered):
+                # a few changes are cheaper to splice in than to merge
+                for k in removed:
+                    del ordered[bisect_left(ordered, k)]
+                for k in added:
+                    insort(ordered, k)
+            else:
+                if removed:
+                    ordered[:] = [k for k in ordered if k not in removed]
+                unordered = added and ordered and added[0] < ordered[-1]
+                ordered += added
+                if unordered:
+                    ordered.sort()
+            if (len(stores) + len(removed)) * _BlockAggregate.BLOCK > len(ordered):
+                # cheaper to rebuild on the next query than to update in place
+                self._aggregates = {}
+            for tree in self._aggregates.values():
+                for k in removed:
+                    tree.discard(k)
+                for k, v in stores.items():
+                    tree.store(k, v)
+        if removed and self.compact_below is not None:
+            self.__shrunk(population)
 
     def __setslice__(self, start, stop, vals):
         '''
@@ -73,30 +461,42 @@ class SparseList(object):
     def __delitem__(self, item):
         if isinstance(item, slice):
             keys_to_remove = range(*item.indices(self.size))
-        elif item < 0:
-            keys_to_remove = (self.size + item, )
+            if keys_to_remove.step < 0:
+                keys_to_remove = keys_to_remove[::-1]
         else:
-            keys_to_remove = (item, )
+            index = operator.index(item)
+            if index < 0:
+                index += self.size
+            if not 0 <= index < self.size:
+                raise IndexError('SparseList assignment index out of range')
+            keys_to_remove = range(index, index + 1)
 
         if not keys_to_remove:
             return
 
-        keys_removed = 0
-        removing_tail = keys_to_remove[-1] == self.size - 1
-
-        for current_key in sorted(self.elements.keys()):
-            if current_key < keys_to_remove[0]:
-                continue
-
-            elif keys_removed < len(keys_to_remove) and current_key > keys_to_remove[keys_removed]:
-                keys_removed += 1
-
-            if keys_removed and not removing_tail:
-                self.elements[current_key - keys_removed] = self.elements[current_key]
+        start, step = keys_to_remove.start, keys_to_remove.step
+        stop = keys_to_remove[-1] + 1
+        if step == 1 and stop == self.size:
+            # nothing after the removed keys needs to shift
+            if len(keys_to_remove) > len(self.elements):
+                keys_to_remove = [k for k in self.elements if k >= start]
+            self.size = start
+            self.__apply({}, keys_to_remove)
+            return
 
-            del self.elements[current_key]
+        # each surviving key moves down by the number of removed keys below it
+        shifted = {}
+        for k, v in self.elements.items():
+            if k < start:
+                shifted[k] = v
+            elif k >= stop:
+                shifted[k - len(keys_to_remove)] = v
+            elif (k - start) % step:
+                shifted[k - (k - start) // step - 1] = v
 
         self.size -= len(keys_to_remove)
+        self.__replace(shifted)
+        self._peak = len(self.elements)
 
     def __delslice__(self, start, stop):
         '''
@@ -105,30 +505,137 @@ class SparseList(object):
         return self.__delitem__(slice(start, stop))
 
     def __iter__(self):
-        for index in range(self.size):
-            yield self[index]
+        if isinstance(self.elements, dict):
+            return map(self.elements.get, range(self.size), repeat(self.default))
+        return _fill_defaults(self.elements.items(), self.size, self.default)
 
-    def __contains__(self, index):
-        return index in self.elements.values()
+    def __reversed__(self):
+        keys, values = self._sorted_items()
+        last = self.size - 1
+        return _fill_defaults(zip(map(last.__sub__, reversed(keys)), reversed(values)), self.size, self.default)
+
+    def __contains__(self, value):
+        if self._is_default(value) and len(self.elements) < self.size:
+            return True
+        if self.sorted_values:
+            values = self.__values_in_order()
+            position = bisect_left(values, value)
+            return position < len(values) and values[position] == value
+        return value in self.elements.values()
 
     def __repr__(self):
         return '[{}]'.format(', '.join([str(e) for e in self]))
 
     def __add__(self, other):
-        result = self[:]
+        result = self.copy()
         return result.__iadd__(other)
 
     def __iadd__(self, other):
-        for element in other:
-            self.append(element)
+        '''
+        append the elements of other, shifting the populated elements of a
+        SparseList that shares this one's default rather than visiting each
+        of its indices. If any element cannot be appended, none is.
+        '''
+        size = self.size
+        if isinstance(other, SparseList) and self._is_default(other.default):
+            extra = other.size
+            elements = other.elements
+            self.update_arrays([k + size for k in elements], list(elements.values()))
+            self.size = size + extra
+        else:
+            try:
+                for element in other:
+                    self.append(element)
+            except Exception:
+                self.__apply({}, [k for k in self.elements if k >= size])
+                self.size = size
+                raise
+        if self.storage == 'auto':
+            self.__adopt(self.elements)
         return self
 
+    def __getstate__(self):
+        '''
+        compact pickle state: the populated indices, sorted and packed into an
+        array, alongside a list of their values
+        '''
+        state = dict(self.__dict__)
+        del state['_ordered'], state['_aggregates'], state['elements']
+        keys, values = self._sorted_items()
+        state['keys'] = _pack_indices(keys)
+        state['values'] = values
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if 'keys' in state:
+            keys = state.pop('keys')
+            values = state.pop('values')
+            elements = dict(zip(keys, values))
+        else:
+            # state pickled before it was made compact: the instance dict
+            elements = state.pop('elements')
+        self.typecode = None
+        self._is_default = partial(operator.eq, state['default'])
+        self.storage = 'dict'
+        self.sorted_values = False
+        self.compact_below = None
+        self._peak = 0
+        self.elements = None
+        self.__dict__.update(state)
+        self.__adopt(elements)
+
+    def _sorted_items(self):
+        '''
+        return a list of the populated indices in ascending order and a list
+        of their values
+        '''
+        elements = self.elements
+        if isinstance(elements, dict):
+            keys = sorted(elements)
+            return keys, list(map(elements.__getitem__, keys))
+        return list(elements), list(elements.values())
+
+    def copy(self):
+        '''
+        return a shallow copy of the SparseList, in time proportional to its
+        population
+        '''
+        result = self.__class__.__new__(self.__class__)
+        result.__dict__.update(self.__dict__)
+        result.elements = self.elements.copy()
+        result._ordered = None if self._ordered is None else self._ordered[:]
+        result._aggregates = {}
+        return result
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        from copy import deepcopy
+
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        state = dict(self.__dict__)
+        del state['_ordered'], state['_aggregates'], state['elements']
+        result.__dict__.update(deepcopy(state, memo))
+        # rebuilt from the populated items, so that no storage sentinel is copied
+        keys, values = self._sorted_items()
+        result.elements = None
+        result.__adopt(dict(zip(keys, deepcopy(values, memo))))
+        return result
+
     def append(self, element):
         '''
         append element, increasing size by exactly one
         '''
-        if element != self.default:
+        if self.typecode is not None:
+            element = array(self.typecode, (element,))[0]
+        if self._is_default(element):
+            pass
+        elif self._ordered is None:
             self.elements[self.size] = element
+        else:
+            self.__index_store(self.size, element)
         self.size += 1
 
     push = append
@@ -141,12 +648,27 @@ class SparseList(object):
                 raise ValueError('Invalid key: {}'.format(key))
             self.size = max(key + 1, self.size)
             return key
-        self.elements = {__convert_and_size(k): v for k, v in arg.items() if v != self.default}
+        if self.typecode is not None:
+            arg = dict(zip(arg.keys(), array(self.typecode, arg.values())))
+        is_default = self._is_default
+        self.__adopt({__convert_and_size(k): v for k, v in arg.items() if not is_default(v)})
 
     def __initialise_from_iterable(self, arg):
         for v in arg:
             self.append(v)
 
+    def __initialise_from_typed_iterable(self, arg):
+        numpy = _backend('numpy') if type(arg).__module__ == 'numpy' else None
+        if numpy is not None:
+            values = numpy.asarray(arg, dtype=self.typecode)
+            keys = numpy.flatnonzero(values != self.default)
+            self.size = len(values)
+            self.__adopt(dict(zip(keys.tolist(), values[keys].tolist())))
+            return
+        values = array(self.typecode, arg)
+        self.size = len(values)
+        self.__adopt(dict(compress(enumerate(values), map(operator.ne, values, repeat(self.default)))))
+
     def __eq__(self, other):
         return len(self) == len(other) and all(a == b for a, b in zip(self, other))
 
@@ -164,10 +686,23 @@ class SparseList(object):
     def __ge__(self, other):
         return not self.__lt__(other)
 
+    def __gt__(self, other):
+        for a, b in zip(self, other):
+            if a > b:
+                return True
+            if a < b:
+                return False
+        return len(self) > len(other)
+
+    def __le__(self, other):
+        return not self.__gt__(other)
+
     def __mul__(self, multiplier):
-        result = self[:]
+        if multiplier < 1:
+            return self.__empty_like()
+        result = self.copy()
         for _ in range(multiplier - 1):
-            result += self[:]
+            result += self
         return result
 
     def count(self, value):
@@ -175,7 +710,7 @@ class SparseList(object):
         return number of occurrences of value
         '''
         return sum(v == value for v in self.elements.values()) + (
-            self.size - len(self.elements) if value == self.default else 0
+            self.size - len(self.elements) if self._is_default(value) else 0
         )
 
     def extend(self, iterable):
@@ -190,14 +725,20 @@ class SparseList(object):
         Raises ValueError if the value is not present.
         '''
 
-        if value == self.default:
-            for k, v in enumerate(self):
-                if v == value:
+        if self._is_default(value):
+            for k in range(self.size):
+                if k not in self.elements:
                     return k
             raise ValueError('{} not in SparseList'.format(value))
-        for k, v in self.elements.items():
-            if v == value:
-                return k
+        if self.sorted_values:
+            values = self.__values_in_order()
+            position = bisect_left(values, value)
+            if position < len(values) and values[position] == value:
+                return self._ordered[position]
+            raise ValueError('{} not in SparseList'.format(value))
+        found = [k for k, v in self.elements.items() if v == value]
+        if found:
+            return min(found)
         raise ValueError('{} not in SparseList'.format(value))
 
     def pop(self):
@@ -216,10 +757,1391 @@ class SparseList(object):
         remove first occurrence of value.
         Raises ValueError if the value is not present.
         '''
-        if value == self.default:
+        if self._is_default(value):
             return
-        for k, v in self.elements.items():
-            if v == value:
-                del self.elements[k]
+        k = self.index(value)
+        if self._ordered is None:
+            del self.elements[k]
+        else:
+            self.__index_discard(k)
+        if self.compact_below is not None:
+            self.__shrunk(len(self.elements) + 1)
+
+    def reverse(self):
+        '''
+        reverse the SparseList in place, in time proportional to its
+        population
+        '''
+        last = self.size - 1
+        self.__replace({last - k: v for k, v in self.elements.items()})
+
+    def sort(self, key=None, reverse=False):
+        '''
+        sort the SparseList in place, as list.sort() would, in time
+        proportional to its population: each run of defaults between populated
+        values is sorted as a single item, and stays in one piece
+        '''
+        default = self.default
+        items = []
+        previous = 0
+        for index, value in zip(*self._sorted_items()):
+            if index > previous:
+                items.append((default, index - previous))
+            items.append((value, 0))
+            previous = index + 1
+        if self.size > previous:
+            items.append((default, self.size - previous))
+        if key is None:
+            items.sort(key=operator.itemgetter(0), reverse=reverse)
+        else:
+            items.sort(key=lambda item: key(item[0]), reverse=reverse)
+        elements = {}
+        position = 0
+        for value, run in items:
+            if not run:
+                elements[position] = value
+                run = 1
+            position += run
+        self.__replace(elements)
+
+    def __shrunk(self, population):
+        '''
+        note that the population has just fallen from the given figure, and
+        compact the storage if the compact_below policy calls for it
+        '''
+        peak = self._peak = max(self._peak, population)
+        if peak >= self.COMPACT_MINIMUM and len(self.elements) < self.compact_below * peak:
+            self.compact()
+
+    def compact(self):
+        '''
+        rebuild the storage to fit the current population, releasing memory
+        held over from when it was larger. With storage='auto', the layout is
+        chosen afresh.
+        '''
+        elements = self.elements
+        self.__replace(dict(elements) if isinstance(elements, dict) else elements.compact())
+        self._peak = len(self.elements)
+
+    def memory_usage(self, deep=False):
+        '''
+        return the number of bytes used by this SparseList, its storage and
+        any indices built over it. With deep, the populated values (and the
+        indices keying a dict) are counted too.
+        '''
+        getsizeof = sys.getsizeof
+        elements = self.elements
+        total = getsizeof(self) + getsizeof(self.__dict__)
+        if isinstance(elements, dict):
+            total += getsizeof(elements)
+            if deep:
+                total += sum(map(getsizeof, elements)) + sum(map(getsizeof, elements.values()))
+        else:
+            total += elements.memory_usage(deep)
+        if self._ordered is not None:
+            total += getsizeof(self._ordered)
+        for tree in self._aggregates.values():
+            total += tree.memory_usage()
+        return total
+
+    def intersect_keys(self, other):
+        '''
+        return a sorted list of the indices populated in both self and other
+        '''
+        return sorted(self.elements.keys() & other.elements.keys())
+
+    def union(self, other, combine=None):
+        '''
+        return a new SparseList populated wherever self or other is populated.
+        Where both are populated, the value is combine(mine, theirs) or, if
+        combine is None, the value from self.
+        '''
+        if combine is None:
+            # merging from self keeps its default, policy and storage
+            return SparseList.merge((self, other), lambda mine, theirs: mine)
+        return SparseList.merge((self, other), combine)
+
+    def difference(self, other):
+        '''
+        return a new SparseList holding the populated elements of self whose
+        indices are not populated in other
+        '''
+        elements = self.elements
+        result = self.__empty_like(self.size)
+        result.__adopt({k: elements[k] for k in elements.keys() - other.elements.keys()})
+        return result
+
+    @classmethod
+    def merge(cls, lists, combine=None):
+        '''
+        k-way merge of SparseLists into a new SparseList, sized to fit the
+        longest of them and sharing the default of the first.
+        Where several lists populate the same index their values are folded
+        together with combine, in list order; if combine is None the last
+        value wins.
+        '''
+        lists = list(lists)
+        result = lists[0].__empty_like() if lists else cls(0)
+        result.sorted_values = False
+        default = result.default
+        is_default = result._is_default
+        merged = {}
+        size = 0
+        for sl in lists:
+            size = max(size, sl.size)
+            elements = sl.elements
+            if not isinstance(elements, dict):
+                elements = dict(elements.items())
+            if sl.default != default:
+                elements = {k: v for k, v in elements.items() if not is_default(v)}
+            if combine is None or not merged:
+                merged.update(elements)
+                continue
+            combined = {k: combine(merged[k], elements[k]) for k in merged.keys() & elements.keys()}
+            merged.update(elements)
+            for k, v in combined.items():
+                if not is_default(v):
+                    merged[k] = v
+                else:
+                    del merged[k]
+        result.size = size
+        result.__adopt(merged)
+        return result
+
+    def bisect_left(self, value):
+        '''
+        return the first index whose populated value is not less than value,
+        or len(self) if there is none.
+        The populated values must be in ascending order, as they are with
+        sorted_values.
+        '''
+        values = self.__values_in_order()
+        position = bisect_left(values, value)
+        return values.keys[position] if position < len(values) else self.size
+
+    def bisect_right(self, value):
+        '''
+        return the first index whose populated value is greater than value,
+        or len(self) if there is none.
+        The populated values must be in ascending order, as they are with
+        sorted_values.
+        '''
+        values = self.__values_in_order()
+        position = bisect_right(values, value)
+        return values.keys[position] if position < len(values) else self.size
+
+    def next_populated(self, index=0):
+        '''
+        return the first populated index at or after index, or None if there
+        is none
+        '''
+        if index < 0:
+            index = max(index + self.size, 0)
+        elements = self.elements
+        if not isinstance(elements, dict):
+            return elements.next_key(index)
+        keys = self._sorted_keys()
+        position = bisect_left(keys, index)
+        return keys[position] if position < len(keys) else None
+
+    def __positions(self, start, stop):
+        '''
+        return the positions in the ordered index spanned by the populated
+        indices in sl[start:stop]
+        '''
+        start, stop, _ = slice(start, stop).indices(self.size)
+        keys = self._sorted_keys()
+        return bisect_left(keys, start), bisect_left(keys, max(start, stop))
+
+    def range_aggregate(self, start, stop, op, identity):
+        '''
+        return the populated values in sl[start:stop] folded together with op,
+        an associative function for which identity is the identity element.
+        The first query for a given op builds an aggregate index, which is
+        maintained by subsequent writes wherever they fall, so that a query or
+        a write costs a block of values plus a logarithm. Indexes are kept for
+        the AGGREGATE_CACHE most recently queried ops.
+        '''
+        start, stop, _ = slice(start, stop).indices(self.size)
+        aggregates = self._aggregates
+        tree = aggregates.pop((op, identity), None)
+        if tree is None:
+            elements = self.elements
+            keys = self._sorted_keys()
+            values = map(elements.__getitem__, keys) if isinstance(elements, dict) else elements.values()
+            tree = _BlockAggregate(op, identity, keys, values)
+            if len(aggregates) >= self.AGGREGATE_CACHE:
+                del aggregates[next(iter(aggregates))]
+        aggregates[(op, identity)] = tree
+        return tree.query(start, max(start, stop))
+
+    def range_count(self, start=None, stop=None):
+        '''
+        return the number of populated values in sl[start:stop]
+        '''
+        lo, hi = self.__positions(start, stop)
+        return hi - lo
+
+    def range_sum(self, start=None, stop=None):
+        '''
+        return the sum of the populated values in sl[start:stop]
+        '''
+        return self.range_aggregate(start, stop, operator.add, 0)
+
+    def range_min(self, start=None, stop=None):
+        '''
+        return the smallest populated value in sl[start:stop].
+        Raises ValueError if there is none.
+        '''
+        result = self.range_aggregate(start, stop, _min, _NOTHING)
+        if result is _NOTHING:
+            raise ValueError('range_min() of an unpopulated range')
+        return result
+
+    def range_max(self, start=None, stop=None):
+        '''
+        return the largest populated value in sl[start:stop].
+        Raises ValueError if there is none.
+        '''
+        result = self.range_aggregate(start, stop, _max, _NOTHING)
+        if result is _NOTHING:
+            raise ValueError('range_max() of an unpopulated range')
+        return result
+
+    def sliding_aggregate(self, width, op=operator.add, identity=0):
+        '''
+        generate (index, aggregate) for each populated index in ascending
+        order, where aggregate folds the populated values in the window
+        sl[index - width + 1:index + 1] together with op.
+        Each value is folded a constant number of times, so the whole stream
+        takes time proportional to the population.
+        '''
+        if width < 1:
+            raise ValueError('width must be at least 1')
+        elements = self.elements
+        front = []
+        back = []
+        back_aggregate = identity
+        for index in self._sorted_keys():
+            value = elements[index]
+            back.append((index, value))
+            back_aggregate = op(back_aggregate, value)
+            while True:
+                if not front:
+                    aggregate = identity
+                    for k, v in reversed(back):
+                        aggregate = op(v, aggregate)
+                        front.append((k, aggregate))
+                    back = []
+                    back_aggregate = identity
+                if front[-1][0] > index - width:
+                    break
+                front.pop()
+            yield index, op(front[-1][1], back_aggregate)
+
+    def to_shared(self, name=None):
+        '''
+        return a read-only SharedSparseList holding a copy of this SparseList
+        in a new block of shared memory, which the caller must unlink() once
+        every process has finished with it
+        '''
+        return SharedSparseList._create(self, name)
+
+    def to_dense(self):
+        '''
+        return every value, defaults included, as a list or, for a typed
+        SparseList, an array.array
+        '''
+        if self.typecode is None:
+            result = [self.default] * self.size
+        else:
+            result = array(self.typecode, [self.default]) * self.size
+        for index, value in self.elements.items():
+            result[index] = value
+        return result
+
+    def to_numpy(self, dense=False):
+        '''
+        return the populated indices and their values as a pair of NumPy
+        arrays in ascending index order or, with dense, every value as a
+        single array.
+        Raises ImportError if NumPy is not available.
+        '''
+        numpy = _backend('numpy')
+        if numpy is None:
+            raise ImportError('to_numpy() needs NumPy')
+        if dense and self.typecode is None:
+            return _numpy_column(numpy, self.to_dense())
+        keys, values = self._sorted_items()
+        indices = numpy.array(_pack_indices(keys), dtype=numpy.int64)
+        if self.typecode is not None:
+            values = numpy.array(array(self.typecode, values), dtype=self.typecode)
+        else:
+            values = _numpy_column(numpy, values)
+        if not dense:
+            return indices, values
+        result = numpy.full(self.size, self.default, dtype=self.typecode)
+        result[indices] = values
+        return result
+
+    @classmethod
+    def from_buffers(cls, indices, values, size=None, default_value=0, **kwargs):
+        '''
+        build a SparseList from two one-dimensional buffers, such as arrays,
+        holding populated indices and their values. Unless a default policy
+        is given, the list is typed by the format of the values buffer.
+        Raises IndexError if an index is negative or not less than size.
+        '''
+        indices = memoryview(indices)
+        values = memoryview(values)
+        if indices.ndim != 1 or values.ndim != 1:
+            raise ValueError('from_buffers() needs one-dimensional buffers')
+        typecode = values.format if values.format in typecodes else None
+        return cls.__from_columns(indices.tolist(), values.tolist(), size, default_value, typecode, kwargs)
+
+    @classmethod
+    def from_numpy(cls, values, indices=None, size=None, default_value=0, **kwargs):
+        '''
+        build a SparseList from a NumPy array of every value, as returned by
+        to_numpy(dense=True), or from arrays of populated indices and their
+        values, as returned by to_numpy(). Unless a default policy is given,
+        the list is typed by the dtype of values.
+        Raises IndexError if an index is negative or not less than size.
+        '''
+        numpy = _backend('numpy')
+        if numpy is None:
+            raise ImportError('from_numpy() needs NumPy')
+        values = numpy.asarray(values)
+        if values.ndim != 1:
+            raise ValueError('from_numpy() needs one-dimensional arrays')
+        if indices is None:
+            size = len(values)
+            indices = numpy.flatnonzero(values != default_value)
+            values = values[indices]
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        typecode = values.dtype.char if values.dtype.char in typecodes else None
+        return cls.__from_columns(indices.tolist(), values.tolist(), size, default_value, typecode, kwargs)
+
+    @classmethod
+    def __from_columns(cls, keys, values, size, default_value, typecode, kwargs):
+        '''
+        build a SparseList from lists of populated indices and their values,
+        typed by typecode unless kwargs give a default policy of their own
+        '''
+        if len(keys) != len(values):
+            raise ValueError('needs as many values as indices')
+        if size is None:
+            size = max(keys, default=-1) + 1
+        if keys and (min(keys) < 0 or max(keys) >= size):
+            raise IndexError('SparseList index out of range')
+        if not any(kwargs.get(policy) for policy in ('typecode', 'is_default', 'identity')):
+            kwargs['typecode'] = typecode
+        result = cls(size, default_value, **kwargs)
+        if result.typecode is not None:
+            values = array(result.typecode, values)
+            populated = map(operator.ne, values, repeat(result.default))
+        else:
+            populated = map(operator.not_, map(result._is_default, values))
+        result.__adopt(dict(compress(zip(keys, values), populated)))
+        return result
+
+    def map_values(self, fn):
+        '''
+        return a lazy SparseView of fn applied to each populated value
+        '''
+        return SparseView(self).map_values(fn)
+
+    def filter_values(self, predicate):
+        '''
+        return a lazy SparseView of the populated values for which predicate
+        is true
+        '''
+        return SparseView(self).filter_values(predicate)
+
+    def where(self, mask):
+        '''
+        return a lazy SparseView of the populated values whose index is true
+        in mask, a SparseList or other sequence
+        '''
+        return SparseView(self).where(mask)
+
+    def _derive(self, elements):
+        '''
+        return a new SparseList of the same size and default policy as this one
+        holding a dict of elements, less any defaults
+        '''
+        result = self.__empty_like(self.size)
+        result.sorted_values = False
+        is_default = self._is_default
+        result.__adopt({k: v for k, v in elements.items() if not is_default(v)})
+        return result
+
+
+_SHARED_HEADER = '=8sqqq8s'
+_SHARED_MAGIC = b'SPARSEL1'
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class SharedSparseList(object):
+    '''
+    A read-only SparseList whose populated indices and values live in a block
+    of shared memory, so that any number of processes can attach to it without
+    copying.
+
+    The populated indices are stored sorted, as 64-bit integers, and searched
+    by bisection. Values of a typed SparseList are packed alongside them;
+    other values are pickled one by one and unpickled as they are read.
+    Pickling a SharedSparseList sends only the name of its block, so it may be
+    handed to multiprocessing workers cheaply.
+    '''
+
+    def __init__(self, shm):
+        import pickle
+        import struct
+
+        size, population, meta_length, typecode = struct.unpack_from(_SHARED_HEADER, shm.buf)[1:]
+        typecode = typecode.rstrip(b'\0').decode('ascii') or None
+        buf = shm.buf
+        offset = struct.calcsize(_SHARED_HEADER)
+        self._shm = shm
+        self._loads = pickle.loads
+        self.size = size
+        self.typecode = typecode
+        self._keys = buf[offset:offset + 8 * population].cast('q')
+        offset += 8 * population
+        if typecode is None:
+            self._offsets = buf[offset:offset + 8 * (population + 1)].cast('q')
+            offset += 8 * (population + 1)
+            self._values = None
+            self._blob = buf[offset:offset + self._offsets[-1]]
+            offset = _align(offset + self._offsets[-1])
+        else:
+            itemsize = array(typecode).itemsize
+            self._offsets = self._blob = None
+            self._values = buf[offset:offset + itemsize * population].cast(typecode)
+            offset = _align(offset + itemsize * population)
+        self.default = self._loads(buf[offset:offset + meta_length])
+
+    @classmethod
+    def _create(cls, sl, name=None):
+        from multiprocessing import shared_memory
+        import pickle
+        import struct
+
+        keys, values = sl._sorted_items()
+        try:
+            packed_keys = array('q', keys)
+        except OverflowError:
+            raise ValueError('a SharedSparseList cannot hold indices of 2 ** 63 or more') from None
+        if sl.typecode is None:
+            pickles = [pickle.dumps(v, pickle.HIGHEST_PROTOCOL) for v in values]
+            offsets = array('q', accumulate(map(len, pickles), initial=0))
+            values = [offsets, b''.join(pickles)]
+        else:
+            values = [array(sl.typecode, values)]
+        meta = pickle.dumps(sl.default, pickle.HIGHEST_PROTOCOL)
+        typecode = (sl.typecode or '').encode('ascii')
+        header = struct.pack(_SHARED_HEADER, _SHARED_MAGIC, sl.size, len(keys), len(meta), typecode)
+
+        sections = [header, packed_keys] + values
+        offset = 0
+        layout = []
+        for section in sections:
+            nbytes = memoryview(section).nbytes
+            layout.append((offset, section, nbytes))
+            offset += nbytes
+        meta_offset = _align(offset)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=meta_offset + len(meta))
+        for offset, section, nbytes in layout:
+            shm.buf[offset:offset + nbytes] = memoryview(section).cast('B')
+        shm.buf[meta_offset:meta_offset + len(meta)] = meta
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        '''
+        attach to a SharedSparseList created by SparseList.to_shared()
+        '''
+        from multiprocessing import shared_memory
+        import struct
+
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                # attaching registers the block with this process's resource
+                # tracker, which would unlink it when this process exits
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        if struct.unpack_from(_SHARED_HEADER, shm.buf)[0] != _SHARED_MAGIC:
+            shm.close()
+            raise ValueError('{} is not a SharedSparseList'.format(name))
+        return cls(shm)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        return SharedSparseList.attach, (self.name,)
+
+    def close(self):
+        '''
+        detach this process from the shared memory
+        '''
+        views = (self._keys, self._values, self._offsets, self._blob)
+        self._keys = self._values = self._offsets = self._blob = None
+        for view in views:
+            if view is not None:
+                view.release()
+        self._shm.close()
+
+    def __del__(self):
+        if '_blob' in self.__dict__:
+            self.close()
+
+    def unlink(self):
+        '''
+        request that the shared memory be destroyed once every process has
+        closed it
+        '''
+        if sys.version_info < (3, 13) and os.name == 'posix':
+            # unlinking unregisters the block, which an attached one no longer
+            # is; registering it again first keeps the resource tracker quiet
+            from multiprocessing import resource_tracker
+            resource_tracker.register(self._shm._name, 'shared_memory')
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def population(self):
+        return len(self._keys)
+
+    def __value(self, position):
+        if self._values is not None:
+            return self._values[position]
+        offsets = self._offsets
+        return self._loads(self._blob[offsets[position]:offsets[position + 1]])
+
+    def __getitem__(self, index):
+        if type(index) is not int:
+            if isinstance(index, slice):
+                return self.__get_slice(index)
+            index = operator.index(index)
+        size = self.size
+        if index < 0:
+            index += size
+            if index < 0:
+                raise IndexError('SharedSparseList index out of range')
+        elif index >= size:
+            raise IndexError('SharedSparseList index out of range')
+        keys = self._keys
+        position = bisect_left(keys, index)
+        if position < len(keys) and keys[position] == index:
+            return self.__value(position)
+        return self.default
+
+    def __get_slice(self, index):
+        indices = range(*index.indices(self.size))
+        result = SparseList(len(indices), self.default, typecode=self.typecode)
+        if indices:
+            result.elements = {
+                indices.index(k): v
+                for k, v in self.items(min(indices), max(indices) + 1)
+                if k in indices
+            }
+        return result
+
+    def __positions(self, start, stop):
+        start, stop, _ = slice(start, stop).indices(self.size)
+        keys = self._keys
+        return bisect_left(keys, start), bisect_left(keys, max(start, stop))
+
+    def items(self, start=None, stop=None):
+        '''
+        generate (index, value) for each populated index in sl[start:stop], in
+        ascending order
+        '''
+        lo, hi = self.__positions(start, stop)
+        keys = self._keys
+        for position in range(lo, hi):
+            yield keys[position], self.__value(position)
+
+    def __iter__(self):
+        return _fill_defaults(self.items(), self.size, self.default)
+
+    def __contains__(self, value):
+        if len(self._keys) < self.size and value == self.default:
+            return True
+        if self._values is not None:
+            return value in self._values
+        return any(v == value for _, v in self.items())
+
+    def __repr__(self):
+        return '[{}]'.format(', '.join([str(e) for e in self]))
+
+    def range_count(self, start=None, stop=None):
+        '''
+        return the number of populated values in sl[start:stop]
+        '''
+        lo, hi = self.__positions(start, stop)
+        return hi - lo
+
+    def range_sum(self, start=None, stop=None):
+        '''
+        return the sum of the populated values in sl[start:stop]
+        '''
+        if self._values is not None:
+            lo, hi = self.__positions(start, stop)
+            return sum(self._values[lo:hi])
+        return sum(v for _, v in self.items(start, stop))
+
+    def to_sparse_list(self):
+        '''
+        return a private, writable SparseList copy
+        '''
+        result = SparseList(self.size, self.default, typecode=self.typecode)
+        result.elements = dict(self.items())
+        return result
+
+
+class SparseView(object):
+    '''
+    A lazy pipeline of transformations over the populated elements of a
+    SparseList. Stages only ever visit populated elements, and nothing is
+    computed until the view is streamed with items() or materialised with
+    to_sparse_list().
+    '''
+
+    def __init__(self, source, stages=()):
+        self.source = source
+        self._stages = tuple(stages)
+
+    def __len__(self):
+        return len(self.source)
+
+    def map_values(self, fn):
+        '''
+        return a view with fn applied to each populated value
+        '''
+        return SparseView(self.source, self._stages + ((_mapped, fn),))
+
+    def filter_values(self, predicate):
+        '''
+        return a view of the populated values for which predicate is true
+        '''
+        return SparseView(self.source, self._stages + ((_filtered, predicate),))
+
+    def where(self, mask):
+        '''
+        return a view of the populated values whose index is true in mask, a
+        SparseList or other sequence
+        '''
+        return SparseView(self.source, self._stages + ((_masked, mask),))
+
+    def items(self):
+        '''
+        generate the (index, value) pairs that survive the pipeline, in
+        ascending order of index
+        '''
+        items = zip(*self.source._sorted_items())
+        for stage, argument in self._stages:
+            items = stage(items, argument)
+        return items
+
+    def to_sparse_list(self):
+        '''
+        return a new SparseList holding the result of the pipeline
+        '''
+        return self.source._derive(dict(self.items()))
+
+
+def _mapped(items, fn):
+    for index, value in items:
+        yield index, fn(value)
+
+
+def _filtered(items, predicate):
+    for index, value in items:
+        if predicate(value):
+            yield index, value
+
+
+def _masked(items, mask):
+    if isinstance(mask, SparseList):
+        get = mask.elements.get
+        default = mask.default
+        for index, value in items:
+            if get(index, default):
+                yield index, value
+    else:
+        for index, value in items:
+            if mask[index]:
+                yield index, value
+
+
+_BACKENDS = {}
+
+
+def _backend(name):
+    '''
+    return the named optional module, importing it on first use, or None if
+    it is not installed or SPARSE_LIST_PURE_PYTHON is set
+    '''
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        pass
+    module = None
+    if not os.environ.get('SPARSE_LIST_PURE_PYTHON'):
+        try:
+            __import__(name)
+            module = sys.modules[name]
+        except ImportError:
+            pass
+    _BACKENDS[name] = module
+    return module
+
+
+def _fill_defaults(items, size, default):
+    '''
+    generate every value of a list of the given size from its populated
+    (index, value) pairs in ascending order, filling the gaps with default
+    '''
+    previous = 0
+    for index, value in items:
+        yield from repeat(default, index - previous)
+        yield value
+        previous = index + 1
+    yield from repeat(default, size - previous)
+
+
+def _numpy_column(numpy, values):
+    '''
+    return a one-dimensional NumPy array of the given values, falling back to
+    an array of objects for values that NumPy would treat as nested
+    '''
+    column = numpy.array(values)
+    if column.ndim != 1:
+        column = numpy.empty(len(values), dtype=object)
+        for position, value in enumerate(values):
+            column[position] = value
+    return column
+
+
+def _pack_indices(indices):
+    '''
+    pack a sequence of indices into an array of signed 64-bit integers, falling
+    back to a list for indices too large to fit
+    '''
+    try:
+        return array('q', indices)
+    except OverflowError:
+        return list(indices)
+
+
+class _ValuesInOrder(object):
+    '''
+    A read-only sequence of the populated values of a SparseList in index
+    order, for bisection
+    '''
+
+    def __init__(self, elements, keys):
+        self.elements = elements
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, position):
+        return self.elements[self.keys[position]]
+
+
+_NOTHING = object()
+
+
+def _min(a, b):
+    if a is _NOTHING:
+        return b
+    if b is _NOTHING or not b < a:
+        return a
+    return b
+
+
+def _max(a, b):
+    if a is _NOTHING:
+        return b
+    if b is _NOTHING or not a < b:
+        return a
+    return b
+
+
+class _SegmentTree(object):
+    '''
+    An iterative segment tree over a sequence of values, answering queries over
+    any contiguous run of them for an associative op in logarithmic time.
+    '''
+
+    def __init__(self, op, identity, values):
+        self.op = op
+        self.identity = identity
+        self.__build(list(values))
+
+    def __build(self, values):
+        op = self.op
+        self.length = len(values)
+        capacity = 1
+        while capacity < self.length:
+            capacity *= 2
+        tree = [self.identity] * (2 * capacity)
+        tree[capacity:capacity + self.length] = values
+        for i in range(capacity - 1, 0, -1):
+            tree[i] = op(tree[2 * i], tree[2 * i + 1])
+        self.capacity = capacity
+        self.tree = tree
+
+    def update(self, position, value):
+        op = self.op
+        tree = self.tree
+        i = position + self.capacity
+        tree[i] = value
+        i >>= 1
+        while i:
+            tree[i] = op(tree[2 * i], tree[2 * i + 1])
+            i >>= 1
+
+    def query(self, lo, hi):
+        op = self.op
+        tree = self.tree
+        left = right = self.identity
+        lo += self.capacity
+        hi += self.capacity
+        while lo < hi:
+            if lo & 1:
+                left = op(left, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right = op(tree[hi], right)
+            lo >>= 1
+            hi >>= 1
+        return op(left, right)
+
+
+class _BlockAggregate(object):
+    '''
+    The populated values of a SparseList folded together with an associative
+    op, held in blocks of consecutive populated indices. Each block keeps its
+    indices, values and their aggregate, and a segment tree over the block
+    aggregates joins whole blocks, so that a query, or an insert, removal or
+    update anywhere, costs a block's worth of work plus a logarithm.
+    '''
+
+    BLOCK = 256
+
+    def __init__(self, op, identity, keys, values):
+        self.op = op
+        self.identity = identity
+        keys = list(keys)
+        values = list(values)
+        size = self.BLOCK
+        self._keys = [keys[i:i + size] for i in range(0, len(keys), size)]
+        self._values = [values[i:i + size] for i in range(0, len(values), size)]
+        self._folds = list(map(self.__fold, self._values))
+        self.__rebuild()
+
+    def __fold(self, values):
+        return reduce(self.op, values, self.identity)
+
+    def __rebuild(self):
+        self._firsts = [keys[0] for keys in self._keys]
+        self._tree = _SegmentTree(self.op, self.identity, self._folds)
+
+    def __refold(self, block):
+        fold = self._folds[block] = self.__fold(self._values[block])
+        self._tree.update(block, fold)
+
+    def __block(self, key):
+        return max(bisect_right(self._firsts, key) - 1, 0)
+
+    def store(self, key, value):
+        if not self._keys:
+            self._keys.append([key])
+            self._values.append([value])
+            self._folds.append(value)
+            self.__rebuild()
+            return
+        block = self.__block(key)
+        keys = self._keys[block]
+        values = self._values[block]
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            values[i] = value
+        else:
+            keys.insert(i, key)
+            values.insert(i, value)
+            self._firsts[block] = keys[0]
+            if len(keys) > 2 * self.BLOCK:
+                half = len(keys) // 2
+                self._keys[block:block + 1] = [keys[:half], keys[half:]]
+                self._values[block:block + 1] = [values[:half], values[half:]]
+                self._folds[block:block + 1] = [self.__fold(values[:half]), self.__fold(values[half:])]
+                self.__rebuild()
                 return
-        raise ValueError('{} not in SparseList'.format(value))
+        self.__refold(block)
+
+    def discard(self, key):
+        block = self.__block(key)
+        keys = self._keys[block]
+        i = bisect_left(keys, key)
+        del keys[i], self._values[block][i]
+        if not keys:
+            del self._keys[block], self._values[block], self._folds[block]
+            self.__rebuild()
+            return
+        self._firsts[block] = keys[0]
+        self.__refold(block)
+
+    def query(self, start, stop):
+        '''
+        return the values at the populated indices from start up to stop
+        folded together
+        '''
+        first = self.__block(start)
+        last = bisect_left(self._firsts, stop) - 1
+        if last < first:
+            return self.identity
+        keys = self._keys
+        values = self._values
+        if first == last:
+            return self.__fold(values[first][bisect_left(keys[first], start):bisect_left(keys[first], stop)])
+        result = self.op(self.__fold(values[first][bisect_left(keys[first], start):]),
+                         self._tree.query(first + 1, last))
+        return self.op(result, self.__fold(values[last][:bisect_left(keys[last], stop)]))
+
+    def memory_usage(self):
+        getsizeof = sys.getsizeof
+        blocks = sum(map(getsizeof, self._keys)) + sum(map(getsizeof, self._values))
+        return blocks + sum(map(getsizeof, (self._keys, self._values, self._folds, self._firsts, self._tree.tree)))
+
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(n):
+        return bin(n).count('1')
+
+# the positions of the set bits in every byte value
+_BIT_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+class _BitmapStorage(MutableMapping):
+    '''
+    Storage for populated elements as an occupancy bitmap over the indices,
+    with the values packed in index order, so that the value for an index is
+    found at its rank (the number of populated indices below it).
+    A running population count is kept for every block of 512 bits, so a rank
+    costs at most a 64-byte popcount. Counts after a write are recomputed
+    lazily, unless a rank is cheaper to count back from the end. Trailing
+    empty bytes are trimmed, so the bitmap ends at the highest populated index.
+    '''
+
+    def __init__(self, items=(), typecode=None):
+        items = sorted(items, key=operator.itemgetter(0))
+        self._bits = bytearray()
+        self._values = [] if typecode is None else array(typecode)
+        self._ranks = array('q', [0])
+        self._valid = 1
+        if items:
+            self.__grow(items[-1][0])
+            bits = self._bits
+            for index, _ in items:
+                bits[index >> 3] |= 1 << (index & 7)
+            self._values.extend(map(operator.itemgetter(1), items))
+
+    def __grow(self, index):
+        needed = (index >> 3) + 1 - len(self._bits)
+        if needed > 0:
+            self._bits.extend(bytes(needed))
+
+    def rank(self, index):
+        '''
+        return the number of populated indices below index
+        '''
+        block = index >> 9
+        bits = self._bits
+        byte = index >> 3
+        if block >= self._valid:
+            if len(bits) - byte < (block + 1 - self._valid) << 6:
+                after = int.from_bytes(bits[byte:], 'little') >> (index & 7)
+                return len(self._values) - _popcount(after)
+            self.__count_blocks(block)
+        start = block << 6
+        count = self._ranks[block] + _popcount(int.from_bytes(bits[start:byte], 'little'))
+        if byte < len(bits):
+            count += _popcount(bits[byte] & ((1 << (index & 7)) - 1))
+        return count
+
+    def __count_blocks(self, block):
+        bits = self._bits
+        ranks = self._ranks
+        del ranks[self._valid:]
+        for b in range(self._valid, block + 1):
+            start = (b - 1) << 6
+            ranks.append(ranks[-1] + _popcount(int.from_bytes(bits[start:start + 64], 'little')))
+        self._valid = block + 1
+
+    def __contains__(self, index):
+        if type(index) is not int or index < 0:
+            return False
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] >> (index & 7) & 1)
+
+    def __getitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self._values[self.rank(index)]
+
+    def get(self, index, default=None):
+        if index not in self:
+            return default
+        return self._values[self.rank(index)]
+
+    def __setitem__(self, index, value):
+        if index in self:
+            self._values[self.rank(index)] = value
+            return
+        if index < 0:
+            raise KeyError(index)
+        self.__grow(index)
+        self._values.insert(self.rank(index), value)
+        self._bits[index >> 3] |= 1 << (index & 7)
+        self._valid = min(self._valid, (index >> 9) + 1)
+
+    def __delitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        del self._values[self.rank(index)]
+        bits = self._bits
+        byte = index >> 3
+        bits[byte] &= ~(1 << (index & 7))
+        self._valid = min(self._valid, (index >> 9) + 1)
+        if byte == len(bits) - 1 and not bits[byte]:
+            del bits[len(bits.rstrip(b'\0')):]
+
+    def __iter__(self):
+        return self.__keys(0, len(self._bits))
+
+    def __keys(self, first, last):
+        '''
+        generate the populated indices in the bytes from first up to last
+        '''
+        bits = self._bits
+        for byte in compress(range(first, last), islice(bits, first, last)):
+            base = byte << 3
+            for bit in _BIT_POSITIONS[bits[byte]]:
+                yield base + bit
+
+    def __len__(self):
+        return len(self._values)
+
+    def range_items(self, start=0, stop=None):
+        '''
+        return the populated (index, value) pairs with start <= index < stop,
+        in ascending order
+        '''
+        end = len(self._bits) << 3
+        stop = end if stop is None else min(stop, end)
+        if start >= stop:
+            return iter(())
+        keys = [k for k in self.__keys(start >> 3, (stop + 7) >> 3) if start <= k < stop]
+        position = self.rank(start)
+        return zip(keys, islice(self._values, position, position + len(keys)))
+
+    def items(self):
+        return zip(self, self._values)
+
+    def values(self):
+        return iter(self._values)
+
+    def next_key(self, index):
+        '''
+        return the first populated index at or after index, or None
+        '''
+        bits = self._bits
+        byte = index >> 3
+        if byte >= len(bits):
+            return None
+        rest = bits[byte] & (0xFF << (index & 7)) & 0xFF
+        if rest:
+            return (byte << 3) + _BIT_POSITIONS[rest][0]
+        for byte in compress(range(byte + 1, len(bits)), islice(bits, byte + 1, None)):
+            return (byte << 3) + _BIT_POSITIONS[bits[byte]][0]
+        return None
+
+    def compact(self):
+        return self.__class__(self.items(), getattr(self._values, 'typecode', None))
+
+    def memory_usage(self, deep=False):
+        getsizeof = sys.getsizeof
+        total = sum(map(getsizeof, (self, self.__dict__, self._bits, self._values, self._ranks)))
+        if deep and isinstance(self._values, list):
+            total += sum(map(getsizeof, self._values))
+        return total
+
+    def copy(self):
+        result = self.__class__.__new__(self.__class__)
+        result._bits = bytearray(self._bits)
+        result._values = self._values[:]
+        result._ranks = array('q', self._ranks)
+        result._valid = self._valid
+        return result
+
+
+class _DenseStorage(MutableMapping):
+    '''
+    Storage for populated elements as a list with a slot for every index,
+    holding _NOTHING where no value is populated.
+    '''
+
+    def __init__(self, items=(), typecode=None):
+        items = list(items)
+        self._slots = [_NOTHING] * (max(map(operator.itemgetter(0), items)) + 1 if items else 0)
+        for index, value in items:
+            self._slots[index] = value
+        self._population = len(items)
+
+    def __contains__(self, index):
+        return type(index) is int and 0 <= index < len(self._slots) and self._slots[index] is not _NOTHING
+
+    def __getitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self._slots[index]
+
+    def get(self, index, default=None):
+        if index not in self:
+            return default
+        return self._slots[index]
+
+    def __setitem__(self, index, value):
+        if index < 0:
+            raise KeyError(index)
+        slots = self._slots
+        if index >= len(slots):
+            slots.extend(repeat(_NOTHING, index + 1 - len(slots)))
+        if slots[index] is _NOTHING:
+            self._population += 1
+        slots[index] = value
+
+    def __delitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        self._slots[index] = _NOTHING
+        self._population -= 1
+
+    def __iter__(self):
+        slots = self._slots
+        return compress(range(len(slots)), map(operator.is_not, slots, repeat(_NOTHING)))
+
+    def __len__(self):
+        return self._population
+
+    def items(self):
+        return zip(self, self.values())
+
+    def values(self):
+        return filter(partial(operator.is_not, _NOTHING), self._slots)
+
+    def range_items(self, start=0, stop=None):
+        '''
+        return the populated (index, value) pairs with start <= index < stop,
+        in ascending order
+        '''
+        slots = self._slots
+        stop = len(slots) if stop is None else min(stop, len(slots))
+        keys = compress(range(start, stop), map(operator.is_not, islice(slots, start, stop), repeat(_NOTHING)))
+        return zip(keys, filter(partial(operator.is_not, _NOTHING), islice(slots, start, stop)))
+
+    def next_key(self, index):
+        '''
+        return the first populated index at or after index, or None
+        '''
+        slots = self._slots
+        populated = map(operator.is_not, islice(slots, index, None), repeat(_NOTHING))
+        for index in compress(range(index, len(slots)), populated):
+            return index
+        return None
+
+    def compact(self):
+        return self.__class__(self.items())
+
+    def memory_usage(self, deep=False):
+        getsizeof = sys.getsizeof
+        total = sum(map(getsizeof, (self, self.__dict__, self._slots)))
+        if deep:
+            total += sum(map(getsizeof, self.values()))
+        return total
+
+    def copy(self):
+        result = self.__class__.__new__(self.__class__)
+        result._slots = self._slots[:]
+        result._population = self._population
+        return result
+
+
+class _ChunkedStorage(MutableMapping):
+    '''
+    Storage for populated elements in fixed-size blocks of indices, each held
+    as a dict of offsets into the block or, once it fills up, as a dense list
+    of slots. Empty blocks are not stored, and the numbers of the stored
+    blocks are kept in ascending order, so ordered scans visit only the
+    populated blocks, one block at a time.
+    '''
+
+    BLOCK_BITS = 12
+    # the population at which a block turns dense, and at which it turns back
+    DENSE_FILL = 512
+    SPARSE_FILL = 256
+
+    def __init__(self, items=(), typecode=None):
+        self._blocks = {}
+        self._numbers = []
+        self._population = 0
+        for index, value in items:
+            self[index] = value
+
+    def __contains__(self, index):
+        if type(index) is not int or index < 0:
+            return False
+        block = self._blocks.get(index >> self.BLOCK_BITS)
+        return block is not None and index & ((1 << self.BLOCK_BITS) - 1) in block
+
+    def __getitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self._blocks[index >> self.BLOCK_BITS][index & ((1 << self.BLOCK_BITS) - 1)]
+
+    def get(self, index, default=None):
+        if type(index) is not int or index < 0:
+            return default
+        block = self._blocks.get(index >> self.BLOCK_BITS)
+        if block is None:
+            return default
+        return block.get(index & ((1 << self.BLOCK_BITS) - 1), default)
+
+    def __setitem__(self, index, value):
+        if index < 0:
+            raise KeyError(index)
+        number = index >> self.BLOCK_BITS
+        block = self._blocks.get(number)
+        if block is None:
+            block = self._blocks[number] = {}
+            insort(self._numbers, number)
+        population = len(block)
+        block[index & ((1 << self.BLOCK_BITS) - 1)] = value
+        if len(block) > population:
+            self._population += 1
+            if len(block) >= self.DENSE_FILL and type(block) is dict:
+                self._blocks[number] = _DenseStorage(block.items())
+
+    def __delitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        number = index >> self.BLOCK_BITS
+        block = self._blocks[number]
+        del block[index & ((1 << self.BLOCK_BITS) - 1)]
+        self._population -= 1
+        if not block:
+            del self._blocks[number]
+            del self._numbers[bisect_left(self._numbers, number)]
+        elif len(block) < self.SPARSE_FILL and type(block) is not dict:
+            self._blocks[number] = dict(block.items())
+
+    def __iter__(self):
+        return map(operator.itemgetter(0), self.range_items())
+
+    def __len__(self):
+        return self._population
+
+    def items(self):
+        return self.range_items()
+
+    def values(self):
+        return map(operator.itemgetter(1), self.range_items())
+
+    def range_items(self, start=0, stop=None):
+        '''
+        generate the populated (index, value) pairs with start <= index < stop,
+        in ascending order, block by block
+        '''
+        bits = self.BLOCK_BITS
+        numbers = self._numbers
+        first = bisect_left(numbers, start >> bits)
+        last = len(numbers) if stop is None else bisect_left(numbers, ((stop - 1) >> bits) + 1)
+        for number in numbers[first:last]:
+            base = number << bits
+            block = self._blocks[number]
+            lo = max(start - base, 0)
+            hi = 1 << bits if stop is None else min(stop - base, 1 << bits)
+            if type(block) is dict:
+                pairs = sorted(item for item in block.items() if lo <= item[0] < hi)
+            else:
+                pairs = block.range_items(lo, hi)
+            for offset, value in pairs:
+                yield base + offset, value
+
+    def next_key(self, index):
+        '''
+        return the first populated index at or after index, or None
+        '''
+        bits = self.BLOCK_BITS
+        numbers = self._numbers
+        for number in islice(numbers, bisect_left(numbers, index >> bits), None):
+            base = number << bits
+            block = self._blocks[number]
+            offset = max(index - base, 0)
+            if type(block) is dict:
+                offset = min((k for k in block if k >= offset), default=None)
+            else:
+                offset = block.next_key(offset)
+            if offset is not None:
+                return base + offset
+        return None
+
+    def compact(self):
+        return self.__class__(self.items())
+
+    def memory_usage(self, deep=False):
+        getsizeof = sys.getsizeof
+        total = sum(map(getsizeof, (self, self.__dict__, self._blocks, self._numbers)))
+        for block in self._blocks.values():
+            if type(block) is not dict:
+                total += block.memory_usage(deep)
+            else:
+                total += getsizeof(block)
+                if deep:
+                    total += sum(map(getsizeof, block.values()))
+        return total
+
+    def copy(self):
+        result = self.__class__.__new__(self.__class__)
+        result._blocks = {number: block.copy() for number, block in self._blocks.items()}
+        result._numbers = self._numbers[:]
+        result._population = self._population
+        return result
+
+
+_LAYOUTS = {'dict': dict, 'bitmap': _BitmapStorage, 'dense': _DenseStorage, 'chunked': _ChunkedStorage}
+_LAYOUT_NAMES = {storage: name for name, storage in _LAYOUTS.items()}
@@ -1,9 +1,26 @@
 #!/usr/bin/env python
 
+import array
+import copy
+import itertools
+from itertools import repeat
+import math
+import multiprocessing
+import operator
+import pickle
+import random
+import subprocess
+import sys
+import time
 import sparse_list
 import pytest
 
 
+def _shared_lookup(args):
+    shared, index = args
+    return shared[index]
+
+
 class TestSparseList:
     def test_init_zero(self):
         sl = sparse_list.SparseList(0)
@@ -162,7 +179,18 @@ class TestSparseList:
 
     def test_get_out_of_bounds(self):
         sl = sparse_list.SparseList(1)
-        assert sl[1] is None
+        with pytest.raises(IndexError):
+            sl[1]
+
+    def test_get_negative_out_of_bounds(self):
+        sl = sparse_list.SparseList(1)
+        with pytest.raises(IndexError):
+            sl[-2]
+
+    def test_get_with_non_integer_index(self):
+        sl = sparse_list.SparseList(2)
+        with pytest.raises(TypeError):
+            sl[1.0]
 
     def test_set_out_of_bounds(self):
         sl = sparse_list.SparseList(1)
@@ -362,6 +390,29 @@ class TestSparseList:
         sl.extend((4, 5, 6))
         assert [1, 2, 3, 4, 5, 6] == sl
 
+    def test_extend_with_sparse_list(self):
+        sl = sparse_list.SparseList({1: 1}, 0)
+        sl += sparse_list.SparseList({2: 2}, 0)
+        assert [0, 1, 0, 0, 2] == sl
+        sl += sl
+        assert [0, 1, 0, 0, 2, 0, 1, 0, 0, 2] == sl
+        assert 4 == sl.population()
+        sl.extend(sparse_list.SparseList({1: 3}, 5))
+        assert [0, 1, 0, 0, 2, 0, 1, 0, 0, 2, 5, 3] == sl
+
+    def test_extend_is_all_or_nothing(self):
+        sl = sparse_list.SparseList([1, 0, 2], 0, sorted_values=True)
+        with pytest.raises(ValueError):
+            sl.extend(iter([3, 0, 1]))
+        with pytest.raises(ValueError):
+            sl += sparse_list.SparseList([3, 0, 1], 0)
+        assert [1, 0, 2] == sl
+        assert [0, 2] == sl._sorted_keys()
+        typed = sparse_list.SparseList([1, 0], 0, typecode='b')
+        with pytest.raises(OverflowError):
+            typed.extend([3, 1000])
+        assert [1, 0] == typed
+
     def test_index_value(self):
         sl = sparse_list.SparseList({0: 1, 4: 1}, 0)
         assert 0 == sl.index(1)
@@ -459,3 +510,1069 @@ class TestSparseList:
         sl[2] = None
         assert 6 == len(sl)
         assert 0 == sl.population()
+
+    def test_intersect_keys(self):
+        a = sparse_list.SparseList({1: 'a', 5: 'b', 9: 'c'})
+        b = sparse_list.SparseList({9: 'x', 2: 'y', 1: 'z'})
+        assert [1, 9] == a.intersect_keys(b)
+
+    def test_union(self):
+        a = sparse_list.SparseList({1: 'a', 5: 'b'})
+        b = sparse_list.SparseList({5: 'x', 7: 'y'})
+        c = a.union(b)
+        assert [None, 'a', None, None, None, 'b', None, 'y'] == c
+        assert 3 == c.population()
+
+    def test_union_keeps_own_default(self):
+        a = sparse_list.SparseList({1: 1}, 0, storage='bitmap')
+        b = sparse_list.SparseList({2: 2, 3: 0}, None)
+        for c in (a.union(b), a.union(b, operator.add)):
+            assert 0 == c.default
+            assert 'bitmap' == c.layout
+            assert [0, 1, 2, 0] == c
+            assert 2 == c.population()
+
+    def test_union_with_combine(self):
+        a = sparse_list.SparseList({1: 1, 5: 2}, 0)
+        b = sparse_list.SparseList({5: -2, 7: 3}, 0)
+        c = a.union(b, lambda x, y: x + y)
+        assert [0, 1, 0, 0, 0, 0, 0, 3] == c
+        assert 2 == c.population()
+
+    def test_difference(self):
+        a = sparse_list.SparseList({1: 'a', 5: 'b', 9: 'c'})
+        b = sparse_list.SparseList({5: 'x'})
+        c = a.difference(b)
+        assert len(a) == len(c)
+        assert {1: 'a', 9: 'c'} == c.elements
+
+    def test_merge(self):
+        lists = [sparse_list.SparseList({i: 1, i + 2: 1}, 0) for i in range(3)]
+        merged = sparse_list.SparseList.merge(lists, lambda x, y: x + y)
+        assert [1, 1, 2, 1, 1] == merged
+        assert 0 == merged.default
+
+    def test_merge_without_combine_last_value_wins(self):
+        a = sparse_list.SparseList({0: 'a', 1: 'b'})
+        b = sparse_list.SparseList({1: 'c'})
+        assert ['a', 'c'] == sparse_list.SparseList.merge([a, b])
+
+    def test_merge_of_sorted_lists_is_unsorted(self):
+        a = sparse_list.SparseList([1, 0, 3], 0, sorted_values=True)
+        b = sparse_list.SparseList([0, 5, 0], 0)
+        for c in (a.union(b), sparse_list.SparseList.merge([a, b])):
+            assert [1, 5, 3] == c
+            assert not c.sorted_values
+            c[0] = 9
+
+    def test_merge_nothing(self):
+        merged = sparse_list.SparseList.merge([])
+        assert 0 == len(merged)
+
+    def test_pickle_round_trip(self):
+        sl = sparse_list.SparseList({7: 'a', 2: 'b'}, 'z')
+        clone = pickle.loads(pickle.dumps(sl))
+        assert sl == clone
+        assert {2: 'b', 7: 'a'} == clone.elements
+        assert 'z' == clone.default
+        assert len(sl) == len(clone)
+
+    def test_unpickle_legacy_state(self):
+        # SparseList({1: 'a', 3: 'b'}, 0) pickled before the state was compact
+        legacy = (b'\x80\x02csparse_list\nSparseList\nq\x00)\x81q\x01}q\x02(X\x07\x00\x00\x00defaultq\x03K\x00'
+                  b'X\x08\x00\x00\x00elementsq\x04}q\x05(K\x01X\x01\x00\x00\x00aq\x06K\x03X\x01\x00\x00\x00bq\x07u'
+                  b'X\x04\x00\x00\x00sizeq\x08K\x04ub.')
+        sl = pickle.loads(legacy)
+        assert [0, 'a', 0, 'b'] == sl
+        assert sl.typecode is None
+        sl[1] = 0
+        sl.append(5)
+        assert [0, 0, 0, 'b', 5] == sl
+        assert 2 == sl.population()
+
+    def test_pickle_state_is_compact(self):
+        sl = sparse_list.SparseList({7: 'a', 2: 'b'})
+        state = sl.__getstate__()
+        assert 'elements' not in state
+        assert [2, 7] == list(state['keys'])
+        assert ['b', 'a'] == state['values']
+
+    def test_pickle_huge_indices(self):
+        sl = sparse_list.SparseList(0)
+        sl[2 ** 70] = 1
+        assert {2 ** 70: 1} == pickle.loads(pickle.dumps(sl)).elements
+
+    def test_copy(self):
+        a = sparse_list.SparseList([1, 2, 3])
+        for b in (a.copy(), copy.copy(a)):
+            b.append(4)
+            assert [1, 2, 3] == a
+            assert [1, 2, 3, 4] == b
+
+    def test_deepcopy(self):
+        a = sparse_list.SparseList({1: [1]})
+        b = copy.deepcopy(a)
+        b[1].append(2)
+        assert [1] == a[1]
+        assert [1, 2] == b[1]
+
+    def test_get_many(self):
+        sl = sparse_list.SparseList({1: 'a', 3: 'b'}, 'z')
+        assert ['a', 'z', 'b', 'b', 'z'] == sl.get_many([1, 2, 3, -1, -4])
+
+    def test_get_many_empty(self):
+        sl = sparse_list.SparseList(3)
+        assert [] == sl.get_many([])
+
+    def test_get_many_out_of_bounds(self):
+        sl = sparse_list.SparseList(3)
+        with pytest.raises(IndexError):
+            sl.get_many([0, 3])
+        with pytest.raises(IndexError):
+            sl.get_many([0, -4])
+
+    def test_setting_an_item_to_default_clears_it(self):
+        sl = sparse_list.SparseList([1, 2, 3])
+        sl[1] = None
+        assert [1, None, 3] == sl
+        assert 2 == sl.population()
+
+    def test_identity_default(self):
+        class Loud(object):
+            def __eq__(self, other):
+                raise AssertionError('compared')
+
+            __ne__ = __eq__
+
+        sentinel = object()
+        sl = sparse_list.SparseList(3, sentinel, identity=True)
+        sl[0] = Loud()
+        sl[1] = sentinel
+        sl.append(Loud())
+        assert 2 == sl.population()
+        assert sentinel is sl[1]
+        assert 1 == sl.index(sentinel)
+
+    def test_is_default_predicate(self):
+        sl = sparse_list.SparseList([1.0, math.nan, 2.0, math.nan], math.nan, is_default=math.isnan)
+        assert 2 == sl.population()
+        assert 2 == sl.count(math.nan)
+        assert 1 == sl.index(math.nan)
+
+    def test_conflicting_default_policies(self):
+        with pytest.raises(ValueError):
+            sparse_list.SparseList(1, None, is_default=callable, identity=True)
+
+    def test_typed_initialisation(self):
+        sl = sparse_list.SparseList([0, 1, 0, 2.5, 0], 0, typecode='d')
+        assert [0, 1, 0, 2.5, 0] == sl
+        assert {1: 1.0, 3: 2.5} == sl.elements
+        assert 5 == len(sl)
+        assert 0.0 == sl.default
+
+    def test_typed_initialisation_by_dict(self):
+        sl = sparse_list.SparseList({3: 0, 4: 7}, 0, typecode='q')
+        assert [0, 0, 0, 0, 7] == sl
+        assert 1 == sl.population()
+
+    def test_typed_initialisation_rejects_other_types(self):
+        with pytest.raises(TypeError):
+            sparse_list.SparseList(['a'], 0, typecode='d')
+
+    def test_slice_keeps_default_policy(self):
+        sentinel = object()
+        sl = sparse_list.SparseList(4, sentinel, identity=True)
+        sl[1] = 'a'
+        part = sl[1:3]
+        part[1] = sentinel
+        assert 1 == part.population()
+
+    def test_index_value_is_lowest_index(self):
+        sl = sparse_list.SparseList({4: 1, 0: 1}, 0)
+        assert 0 == sl.index(1)
+
+    def test_range_sum(self):
+        sl = sparse_list.SparseList({1: 1, 3: 2, 8: 4, 9: 8}, 0)
+        assert 15 == sl.range_sum()
+        assert 3 == sl.range_sum(1, 8)
+        assert 12 == sl.range_sum(-2)
+        assert 0 == sl.range_sum(4, 8)
+        assert 0 == sl.range_sum(8, 1)
+
+    def test_range_sum_follows_writes(self):
+        sl = sparse_list.SparseList({1: 1, 3: 2}, 0)
+        assert 3 == sl.range_sum()
+        sl[3] = 5
+        assert 6 == sl.range_sum()
+        sl.append(10)
+        assert 16 == sl.range_sum()
+        sl[2] = 100
+        assert 116 == sl.range_sum()
+        assert 101 == sl.range_sum(0, 3)
+        sl[4] = 0
+        assert 106 == sl.range_sum()
+        sl.remove(100)
+        assert 6 == sl.range_sum()
+        del sl[0]
+        assert 5 == sl.range_sum(1, 3)
+
+    def test_range_min_max_and_count(self):
+        sl = sparse_list.SparseList({2: 'b', 5: 'a', 7: 'c'})
+        assert 'a' == sl.range_min()
+        assert 'b' == sl.range_min(0, 5)
+        assert 'c' == sl.range_max()
+        assert 2 == sl.range_count(3)
+        with pytest.raises(ValueError):
+            sl.range_max(3, 5)
+
+    def test_range_aggregate_preserves_order(self):
+        sl = sparse_list.SparseList({2: 'b', 5: 'a', 7: 'c'}, '')
+        assert 'bac' == sl.range_aggregate(None, None, operator.add, '')
+        sl.append('d')
+        assert 'acd' == sl.range_aggregate(3, None, operator.add, '')
+
+    def test_range_aggregate_grows_past_capacity(self):
+        sl = sparse_list.SparseList(0, 0)
+        for i in range(1, 20):
+            sl.append(i)
+            assert sum(range(i + 1)) == sl.range_sum()
+        for i in range(19, 0, -1):
+            assert sum(range(i + 1)) == sl.range_sum()
+            sl.pop()
+
+    def test_range_aggregate_maintained_through_inserts_and_removals(self):
+        sl = sparse_list.SparseList(100000, 0)
+        sl.update((i, 1) for i in range(0, 100000, 7))
+        expected = list(sl)
+        rng = random.Random(0)
+        assert sum(expected) == sl.range_sum()
+        tree = sl._aggregates[(operator.add, 0)]
+        for _ in range(300):
+            index = rng.randrange(100000)
+            sl[index] = expected[index] = rng.choice([0, 0, 1, 5])
+            start, stop = sorted(rng.randrange(100000) for _ in range(2))
+            assert sum(expected[start:stop]) == sl.range_sum(start, stop)
+        # maintained in place rather than rebuilt
+        assert tree is sl._aggregates[(operator.add, 0)]
+        assert max(expected) == sl.range_max()
+
+    def test_range_aggregate_cache_is_bounded(self):
+        sl = sparse_list.SparseList(range(100), 0)
+        for _ in range(10):
+            assert 4950 == sl.range_aggregate(None, None, lambda a, b: a + b, 0)
+        assert sl.AGGREGATE_CACHE == len(sl._aggregates)
+        sl.range_sum()
+        for _ in range(10):
+            sl.range_aggregate(None, None, lambda a, b: a + b, 0)
+            sl.range_sum()
+        assert (operator.add, 0) in sl._aggregates
+
+    def test_sliding_aggregate(self):
+        sl = sparse_list.SparseList({0: 1, 1: 2, 4: 4, 5: 8, 9: 16}, 0)
+        assert [(0, 1), (1, 3), (4, 6), (5, 12), (9, 16)] == list(sl.sliding_aggregate(4))
+
+    def test_sliding_aggregate_non_commutative(self):
+        sl = sparse_list.SparseList('ab..cd.e', '.')
+        windows = list(sl.sliding_aggregate(3, operator.add, ''))
+        assert [(0, 'a'), (1, 'ab'), (4, 'c'), (5, 'cd'), (7, 'de')] == windows
+
+    def test_shared(self):
+        sl = sparse_list.SparseList({1: 'a', 4: ('b', 2), 6: None}, 'z')
+        with sl.to_shared() as shared:
+            try:
+                assert list(sl) == list(shared)
+                assert 7 == len(shared)
+                assert 3 == shared.population()
+                assert ('b', 2) == shared[-3]
+                assert 'z' == shared[0]
+                assert 2 == shared.range_count(2)
+                assert [(4, ('b', 2))] == list(shared.items(2, 6))
+                assert ['a', ('b', 2)] == shared[1:6:3]
+                assert [None, 'z', ('b', 2), 'z'] == shared[:2:-1]
+                assert sl == shared.to_sparse_list()
+                assert 'z' in shared
+                assert ('b', 2) in shared
+                assert 'y' not in shared
+                with pytest.raises(IndexError):
+                    shared[7]
+            finally:
+                shared.unlink()
+
+    def test_shared_typed(self):
+        sl = sparse_list.SparseList([0, 1.5, 0, 0, 2.5], 0, typecode='d')
+        with sl.to_shared() as shared:
+            try:
+                assert [0, 1.5, 0, 0, 2.5] == list(shared)
+                assert 4.0 == shared.range_sum()
+                assert 1.5 == shared.range_sum(0, 4)
+                assert 0 in shared
+                assert 2.5 in shared
+                assert 3 not in shared
+            finally:
+                shared.unlink()
+
+    def test_shared_default_not_in_a_full_list(self):
+        sl = sparse_list.SparseList([1, 2], 0, typecode='q')
+        with sl.to_shared() as shared:
+            try:
+                assert 0 not in shared
+                assert 2 in shared
+            finally:
+                shared.unlink()
+
+    def test_shared_rejects_huge_indices(self):
+        sl = sparse_list.SparseList({2 ** 63: 'x'})
+        with pytest.raises(ValueError):
+            sl.to_shared()
+
+    def test_shared_attach_and_pickle(self):
+        sl = sparse_list.SparseList({3: 'x'})
+        with sl.to_shared() as shared:
+            try:
+                with sparse_list.SharedSparseList.attach(shared.name) as attached:
+                    assert 'x' == attached[3]
+                with pickle.loads(pickle.dumps(shared)) as unpickled:
+                    assert 'x' == unpickled[3]
+                    assert shared.name == unpickled.name
+            finally:
+                shared.unlink()
+
+    def test_shared_outlives_unrelated_readers(self):
+        sl = sparse_list.SparseList({3: 'x'})
+        with sl.to_shared() as shared:
+            try:
+                script = 'import sparse_list; print(sparse_list.SharedSparseList.attach({!r})[3])'.format(shared.name)
+                for _ in range(2):
+                    output = subprocess.check_output([sys.executable, '-c', script], universal_newlines=True)
+                    assert 'x' == output.strip()
+                    with sparse_list.SharedSparseList.attach(shared.name) as attached:
+                        assert 'x' == attached[3]
+            finally:
+                shared.unlink()
+
+    def test_shared_with_worker_processes(self):
+        sl = sparse_list.SparseList({i: i * i for i in range(0, 100, 7)}, 0)
+        with sl.to_shared() as shared:
+            try:
+                with multiprocessing.get_context('spawn').Pool(2) as pool:
+                    results = pool.map(_shared_lookup, [(shared, i) for i in range(len(sl))])
+                assert list(sl) == results
+            finally:
+                shared.unlink()
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense'])
+    def test_storage_layouts(self, storage):
+        values = [None] * 1500
+        for i in range(3, 1500, 7):
+            values[i] = i
+        sl = sparse_list.SparseList(values, storage=storage)
+        assert storage == sl.layout
+        assert values == sl
+        assert len(values) - values.count(None) == sl.population()
+        sl[1200] = 'x'
+        sl[5] = 'y'
+        sl[3] = None
+        sl.append('z')
+        values[1200], values[5], values[3] = 'x', 'y', None
+        values.append('z')
+        assert values == list(sl)
+        assert values[600] == sl[600]
+        assert values[1199:1300] == sl[1199:1300]
+        assert storage == sl[2:].layout
+        assert 10 == sl.next_populated(6)
+        assert 1500 == sl.next_populated(-1)
+        assert sl.next_populated(1501) is None
+        assert values == pickle.loads(pickle.dumps(sl))
+        assert values == sl.copy()
+        assert values == copy.deepcopy(sl)
+        assert storage == copy.deepcopy(sl).layout
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense', 'chunked'])
+    def test_typed_scalar_writes_are_converted(self, storage):
+        sl = sparse_list.SparseList([0, 1, 0], 0, typecode='q', storage=storage)
+        with pytest.raises(TypeError):
+            sl[1] = 'x'
+        with pytest.raises(TypeError):
+            sl.append(2.7)
+        assert [0, 1, 0] == sl
+        sl = sparse_list.SparseList([0, 1, 0], 0, typecode='d', storage=storage)
+        sl[2] = 3
+        sl.append(True)
+        assert [0.0, 1.0, 3.0, 1.0] == sl.to_dense().tolist()
+        assert float is type(sl[2]) is type(sl[3])
+
+    def test_auto_storage_follows_batch_writes(self):
+        sl = sparse_list.SparseList(1000, 0, storage='auto')
+        assert 'dict' == sl.layout
+        sl.update((i, 1) for i in range(0, 1000, 10))
+        assert 'bitmap' == sl.layout
+        sl.update_arrays(range(1000), [1] * 1000)
+        assert 'dense' == sl.layout
+        sl.clear_many(range(5, 1000))
+        assert 'dict' == sl.layout
+        assert [1] * 5 + [0] * 995 == sl
+
+    def test_bitmap_typed_values(self):
+        sl = sparse_list.SparseList([0, 1, 0, 2], 0, typecode='d', storage='bitmap')
+        assert [0, 1, 0, 2] == sl
+        sl[2] = 1.5
+        assert {1: 1.0, 2: 1.5, 3: 2.0} == sl.elements
+
+    def test_bitmap_removal(self):
+        sl = sparse_list.SparseList(range(1, 1100), storage='bitmap')
+        del sl[:1000:3]
+        expected = list(range(1, 1100))
+        del expected[:1000:3]
+        assert expected == sl
+
+    def test_auto_storage(self):
+        assert 'dict' == sparse_list.SparseList({5: 1, 900: 2}, storage='auto').layout
+        assert 'bitmap' == sparse_list.SparseList({i: 1 for i in range(0, 900, 5)}, storage='auto').layout
+        assert 'dense' == sparse_list.SparseList(range(1, 900), storage='auto').layout
+
+    def test_auto_storage_adapts_on_extend(self):
+        sl = sparse_list.SparseList(1000, storage='auto')
+        assert 'dict' == sl.layout
+        sl.extend(range(1, 1000))
+        assert 'bitmap' == sl.layout
+        sl.extend(range(1, 10000))
+        assert 'dense' == sl.layout
+
+    def test_unknown_storage(self):
+        with pytest.raises(ValueError):
+            sparse_list.SparseList(1, storage='tape')
+
+    def test_sorted_values(self):
+        sl = sparse_list.SparseList({2: 10, 5: 20, 6: 20, 9: 40}, sorted_values=True)
+        assert 5 == sl.index(20)
+        assert 20 in sl
+        assert 30 not in sl
+        with pytest.raises(ValueError):
+            sl.index(30)
+        assert 0 == sl.index(None)
+        assert 5 == sl.bisect_left(20)
+        assert 9 == sl.bisect_right(20)
+        assert 2 == sl.bisect_left(0)
+        assert 10 == sl.bisect_left(41)
+
+    def test_sorted_values_enforced(self):
+        sl = sparse_list.SparseList({2: 10, 5: 20}, sorted_values=True)
+        sl[3] = 15
+        sl.append(25)
+        sl[5] = 25
+        with pytest.raises(ValueError):
+            sl[4] = 5
+        with pytest.raises(ValueError):
+            sl[2] = 16
+        with pytest.raises(ValueError):
+            sl.append(1)
+        assert [None, None, 10, 15, None, 25, 25] == sl
+        assert 5 == sl.index(25)
+
+    def test_sorted_values_slice_assignment_is_checked_as_a_whole(self):
+        sl = sparse_list.SparseList([1, 2, 3], sorted_values=True)
+        sl[0:3] = [4, 5, 6]
+        assert [4, 5, 6] == sl
+        with pytest.raises(ValueError):
+            sl[0:3] = [0, 7, 6]
+        assert [4, 5, 6] == sl
+        with pytest.raises(ValueError):
+            sl[2:5] = [7, 1, 9]
+        assert [4, 5, 6] == sl
+        assert 3 == len(sl)
+
+    def test_sorted_values_rejects_unsorted_initialisation(self):
+        with pytest.raises(ValueError):
+            sparse_list.SparseList([1, 3, 2], sorted_values=True)
+
+    def test_sorted_values_survive_removal_and_copies(self):
+        sl = sparse_list.SparseList([1, 2, 3, 4], sorted_values=True)
+        del sl[1]
+        assert 2 == sl.index(4)
+        assert 1 == sl[:2].index(3)
+        assert sl[::-1].sorted_values is False
+        clone = pickle.loads(pickle.dumps(sl))
+        assert 2 == clone.index(4)
+        with pytest.raises(ValueError):
+            clone.append(0)
+
+    def test_import_is_cheap(self):
+        script = (
+            'import sys; before = set(sys.modules); import sparse_list; '
+            'print(" ".join(sorted(set(sys.modules) - before)))'
+        )
+        imported = subprocess.check_output([sys.executable, '-c', script], universal_newlines=True).split()
+        for heavy in ('copy', 'multiprocessing', 'numpy', 'pickle', 're', 'struct'):
+            assert heavy not in imported
+
+    def test_pure_python_disables_optional_backends(self, monkeypatch):
+        monkeypatch.setattr(sparse_list, '_BACKENDS', {})
+        monkeypatch.setenv('SPARSE_LIST_PURE_PYTHON', '1')
+        assert sparse_list._backend('array') is None
+
+    def test_missing_backend(self, monkeypatch):
+        monkeypatch.setattr(sparse_list, '_BACKENDS', {})
+        monkeypatch.delenv('SPARSE_LIST_PURE_PYTHON', raising=False)
+        assert sparse_list._backend('no_such_backend') is None
+        assert sys.modules['array'] is sparse_list._backend('array')
+
+    def test_set_with_negative_index(self):
+        sl = sparse_list.SparseList(3)
+        sl[-1] = 'a'
+        assert [None, None, 'a'] == sl
+        with pytest.raises(IndexError):
+            sl[-4] = 'b'
+
+    def test_update(self):
+        sl = sparse_list.SparseList([1, 2, 3], 0)
+        sl.update([(0, 0), (5, 6), (-2, 7), (1, 8)])
+        assert [0, 8, 3, 0, 0, 6] == sl
+        assert 3 == sl.population()
+        sl.update({2: 0})
+        assert [0, 8, 0, 0, 0, 6] == sl
+        sl.update([(3, 1), (-1, 2), (3, 4), (5, 5)])
+        assert [0, 8, 0, 4, 0, 5] == sl
+        sl.update([])
+        assert 3 == sl.population()
+
+    def test_update_arrays(self):
+        sl = sparse_list.SparseList(4, 0, typecode='d')
+        sl.update_arrays([3, 1, 3], [1, 2, 0])
+        assert [0, 2, 0, 0] == sl
+        assert {1: 2.0} == sl.elements
+        with pytest.raises(TypeError):
+            sl.update_arrays([0], ['x'])
+        with pytest.raises(ValueError):
+            sl.update_arrays([0, 1], [1])
+
+    def test_update_validates_before_writing(self):
+        sl = sparse_list.SparseList(4)
+        with pytest.raises(IndexError):
+            sl.update([(1, 'a'), (-5, 'b')])
+        with pytest.raises(TypeError):
+            sl.update([(1, 'a'), ('x', 'b')])
+        assert 0 == sl.population()
+
+    def test_update_maintains_indices(self):
+        sl = sparse_list.SparseList({2: 1, 4: 2}, 0)
+        assert 3 == sl.range_sum()
+        sl.update([(4, 3), (6, 4), (7, 5)])
+        assert 13 == sl.range_sum()
+        sl.update([(3, 10)])
+        assert 23 == sl.range_sum()
+        assert 6 == sl.next_populated(5)
+        sl.clear_many([2, 6])
+        assert 18 == sl.range_sum()
+        assert 7 == sl.next_populated(5)
+
+    def test_update_sorted_values(self):
+        sl = sparse_list.SparseList({2: 10, 5: 20}, sorted_values=True)
+        sl.update([(5, 30), (7, 40)])
+        assert 7 == sl.index(40)
+        with pytest.raises(ValueError):
+            sl.update([(8, 50), (1, 60)])
+        assert [None, None, 10, None, None, 30, None, 40] == sl
+
+    def test_update_sorted_values_checks_the_result(self):
+        sl = sparse_list.SparseList([1, 2, 3, 4], 0, sorted_values=True)
+        sl.update_arrays([3, 1, 2], [7, 5, 6])
+        assert [1, 5, 6, 7] == sl
+        sl.update([(1, 0), (2, 0), (0, 6)])
+        assert [6, 0, 0, 7] == sl
+        for pairs in ([(1, 5)], [(2, 8)], [(4, 9), (5, 8)], [(3, 0), (1, 7), (2, 5)]):
+            with pytest.raises(ValueError):
+                sl.update(pairs)
+            assert [6, 0, 0, 7] == sl
+        assert [0, 3] == sl._sorted_keys()
+
+    def test_clear_many(self):
+        sl = sparse_list.SparseList(range(1, 6))
+        sl.clear_many([0, -1, 2])
+        assert [None, 2, None, 4, None] == sl
+        assert 5 == len(sl)
+        with pytest.raises(IndexError):
+            sl.clear_many([5])
+
+    def test_map_values(self):
+        sl = sparse_list.SparseList({1: 1, 3: 2, 4: 3}, 0)
+        doubled = sl.map_values(lambda v: v * 2).to_sparse_list()
+        assert [0, 2, 0, 4, 6] == doubled
+        assert [0, 1, 0, 2, 3] == sl
+
+    def test_map_values_drops_defaults(self):
+        sl = sparse_list.SparseList({1: 1, 3: 2, 4: 3}, 0)
+        result = sl.map_values(lambda v: v % 2).to_sparse_list()
+        assert [0, 1, 0, 0, 1] == result
+        assert 2 == result.population()
+
+    def test_view_is_lazy(self):
+        calls = []
+        sl = sparse_list.SparseList(10 ** 9)
+        sl[5] = 'a'
+        view = sl.map_values(lambda v: calls.append(v) or v.upper())
+        assert not calls
+        assert [(5, 'A')] == list(view.items())
+        assert ['a'] == calls
+        assert 10 ** 9 == len(view)
+
+    def test_filter_values_and_where_compose(self):
+        sl = sparse_list.SparseList(range(10), 0)
+        mask = sparse_list.SparseList({i: True for i in range(0, 10, 3)}, False)
+        view = sl.filter_values(lambda v: v % 2).map_values(lambda v: v * 10).where(mask)
+        assert [(3, 30), (9, 90)] == list(view.items())
+        result = view.to_sparse_list()
+        assert 10 == len(result)
+        assert {3: 30, 9: 90} == result.elements
+
+    def test_where_with_plain_sequence(self):
+        sl = sparse_list.SparseList('abcd')
+        assert [(1, 'b'), (3, 'd')] == list(sl.where([0, 1, 0, 1]).items())
+
+    def test_memory_usage(self):
+        sl = sparse_list.SparseList(100, 0)
+        sl[1:4] = ['a', 'b', 'c']
+        shallow = sl.memory_usage()
+        assert isinstance(shallow, int)
+        assert sl.memory_usage(deep=True) > shallow
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense'])
+    def test_compact_releases_memory(self, storage):
+        sl = sparse_list.SparseList(range(1, 10001), storage=storage)
+        del sl[10:]
+        before = sl.memory_usage()
+        sl.compact()
+        assert sl.memory_usage() < before
+        assert sl == list(range(1, 11))
+
+    def test_compact_keeps_sorted_values(self):
+        sl = sparse_list.SparseList(range(1, 1001), 0, sorted_values=True)
+        sl.clear_many(range(10, 1000))
+        sl.compact()
+        assert 5 in sl
+        assert sl.index(5) == 4
+        assert sl.layout == 'dict'
+
+    def test_compact_below_compacts_automatically(self):
+        sl = sparse_list.SparseList(range(1, 1001), 0, compact_below=0.25)
+        before = sl.memory_usage()
+        for i in range(900):
+            sl[i] = 0
+        assert sl.memory_usage() < before
+        assert sl.population() == 100
+        assert list(sl)[899:902] == [0, 901, 902]
+
+    def test_compact_below_is_kept_by_slices(self):
+        sl = sparse_list.SparseList(range(10), compact_below=0.5)
+        assert sl[2:5].compact_below == 0.5
+
+    def test_to_dense(self):
+        sl = sparse_list.SparseList(6, 0)
+        sl[1] = 7
+        sl[4] = 9
+        assert sl.to_dense() == [0, 7, 0, 0, 9, 0]
+
+    def test_to_dense_typed(self):
+        sl = sparse_list.SparseList([0, 1.5, 0, 2.5], 0, typecode='d')
+        dense = sl.to_dense()
+        assert dense.typecode == 'd'
+        assert dense.tolist() == [0.0, 1.5, 0.0, 2.5]
+
+    def test_from_buffers(self):
+        indices = array.array('q', [5, 1, 3])
+        values = array.array('d', [5.5, 1.5, 0.0])
+        sl = sparse_list.SparseList.from_buffers(indices, values, size=8)
+        assert sl.typecode == 'd'
+        assert sl == [0, 1.5, 0, 0, 0, 5.5, 0, 0]
+        assert sl.population() == 2
+
+    def test_from_buffers_sizes_to_last_index(self):
+        sl = sparse_list.SparseList.from_buffers(array.array('q', [2]), array.array('l', [4]), storage='bitmap')
+        assert sl == [0, 0, 4]
+        assert sl.layout == 'bitmap'
+
+    def test_from_buffers_with_default_policy(self):
+        sl = sparse_list.SparseList.from_buffers(array.array('q', [0, 2]), bytearray(b'ab'), default_value=97,
+                                                 identity=True)
+        assert sl.typecode is None
+        assert sl.population() == 1
+
+    def test_from_buffers_rejects_out_of_range_indices(self):
+        with pytest.raises(IndexError):
+            sparse_list.SparseList.from_buffers(array.array('q', [3]), array.array('d', [1.0]), size=3)
+        with pytest.raises(IndexError):
+            sparse_list.SparseList.from_buffers(array.array('q', [-1]), array.array('d', [1.0]))
+        with pytest.raises(ValueError):
+            sparse_list.SparseList.from_buffers(array.array('q', [1, 2]), array.array('d', [1.0]))
+
+    def test_to_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        sl = sparse_list.SparseList([0, 3, 0, 4], 0, typecode='q')
+        indices, values = sl.to_numpy()
+        assert indices.tolist() == [1, 3]
+        assert values.tolist() == [3, 4]
+        assert sl.to_numpy(dense=True).tolist() == [0, 3, 0, 4]
+        assert sparse_list.SparseList.from_numpy(values, indices, size=4) == sl
+        assert sparse_list.SparseList.from_numpy(numpy.array([0, 3, 0, 4])) == sl
+
+    def test_to_numpy_untyped(self):
+        pytest.importorskip('numpy')
+        sl = sparse_list.SparseList(3)
+        sl[1] = 'x'
+        assert sl.to_numpy(dense=True).tolist() == [None, 'x', None]
+
+    def test_reversed_stepped_slice_removal(self):
+        sl = sparse_list.SparseList(range(10), None)
+        del sl[8:1:-3]
+        assert [0, 1, 3, 4, 6, 7, 9] == sl
+
+    def test_stepped_slice_removal_reaching_the_end(self):
+        sl = sparse_list.SparseList(range(10), None)
+        del sl[1::2]
+        assert [0, 2, 4, 6, 8] == sl
+
+    def test_removal_out_of_range(self):
+        sl = sparse_list.SparseList(range(3), None)
+        with pytest.raises(IndexError):
+            del sl[3]
+        with pytest.raises(IndexError):
+            del sl[-4]
+        assert [0, 1, 2] == sl
+
+    def test_multiply_by_zero(self):
+        sl = sparse_list.SparseList({0: 1, 4: 1}, 0)
+        assert [] == sl * 0
+        assert [] == sl * -1
+
+    def test_remove_value_lowest_index_first(self):
+        sl = sparse_list.SparseList(3, None)
+        sl[2] = 5
+        sl[0] = 5
+        sl.remove(5)
+        assert [None, None, 5] == sl
+
+    def test_contains_default_value(self):
+        sl = sparse_list.SparseList(3, 0)
+        assert 0 in sl
+        sl[0:3] = [1, 2, 3]
+        assert 0 not in sl
+
+    def test_greater_than_and_less_or_equal(self):
+        sl = sparse_list.SparseList([1, 0, 2], 0)
+        assert sl > [1, 0, 1]
+        assert sl <= [1, 0, 2]
+        assert not sl > [1, 0, 2, 0]
+        assert sl <= [1, 1]
+
+    def test_reversed_fills_default_runs(self):
+        sl = sparse_list.SparseList(6, 0)
+        sl[1] = 7
+        sl[4] = 9
+        assert [0, 9, 0, 0, 7, 0] == list(reversed(sl))
+
+    def test_reversed_is_lazy(self):
+        sl = sparse_list.SparseList(10 ** 12, 0)
+        sl[-2] = 5
+        assert [0, 5, 0] == list(itertools.islice(reversed(sl), 3))
+
+    def test_reverse(self):
+        sl = sparse_list.SparseList([1, 0, 2, 0, 0], 0)
+        sl.reverse()
+        assert [0, 0, 2, 0, 1] == sl
+        assert 2 == sl.population()
+
+    def test_reverse_keeps_storage(self):
+        sl = sparse_list.SparseList([1, 0, 2, 3], 0, storage='bitmap')
+        sl.reverse()
+        assert [3, 2, 0, 1] == sl
+        assert sl.layout == 'bitmap'
+
+    def test_reverse_sorted_values(self):
+        sl = sparse_list.SparseList([0, 1, 0, 2], 0, sorted_values=True)
+        with pytest.raises(ValueError):
+            sl.reverse()
+        assert [0, 1, 0, 2] == sl
+        assert 1 in sl
+        sl = sparse_list.SparseList([0, 1, 0, 1, 0], 0, sorted_values=True)
+        sl.reverse()
+        assert [0, 1, 0, 1, 0] == sl
+
+    def test_sort(self):
+        sl = sparse_list.SparseList([3, 0, -1, 0, 2], 0)
+        sl.sort()
+        assert [-1, 0, 0, 2, 3] == sl
+        sl.sort(reverse=True)
+        assert [3, 2, 0, 0, -1] == sl
+
+    def test_sort_with_key_is_stable(self):
+        sl = sparse_list.SparseList([3, 0, 2, 0, 5, 4], 0)
+        sl.sort(key=lambda v: v % 2)
+        assert [0, 2, 0, 4, 3, 5] == sl
+
+    def test_sort_long_sparse_list(self):
+        sl = sparse_list.SparseList(10 ** 12, 0)
+        sl[10] = 2
+        sl[5] = -1
+        sl.sort()
+        assert sl[0] == -1
+        assert sl[-1] == 2
+        assert 2 == sl.population()
+
+    def test_chunked_storage(self):
+        sl = sparse_list.SparseList(10 ** 10, 0, storage='chunked')
+        sl.update((5 * 10 ** 9 + i, i % 7 + 1) for i in range(1000))
+        sl[10] = 3
+        assert sl.layout == 'chunked'
+        assert 1001 == sl.population()
+        assert [0, 3, 0] == sl[9:12]
+        assert list(range(1, 8)) == sl[5 * 10 ** 9 + 7:5 * 10 ** 9 + 14]
+        assert 5 * 10 ** 9 == sl.next_populated(11)
+        assert [0, 3] == list(itertools.islice(iter(sl), 9, 11))
+
+    def test_chunked_blocks_turn_dense_and_back(self):
+        sl = sparse_list.SparseList(10000, 0, storage='chunked')
+        sl.update((i, 1) for i in range(4096, 4096 + 600))
+        blocks = sl.elements._blocks
+        assert [1] == list(blocks)
+        assert not isinstance(blocks[1], dict)
+        assert copy.deepcopy(sl) == sl
+        sl.clear_many(range(4096, 4096 + 400))
+        assert isinstance(blocks[1], dict)
+        sl.clear_many(range(4096, 4096 + 600))
+        assert {} == blocks
+        assert [0] * 10000 == sl
+
+    def test_chunked_storage_round_trips(self):
+        sl = sparse_list.SparseList(range(10000), storage='chunked')
+        assert pickle.loads(pickle.dumps(sl)) == sl
+        assert sl.copy() == sl
+        assert copy.deepcopy(sl) == sl
+        assert sl.range_sum(100, 5000) == sum(range(100, 5000))
+        assert list(range(9999, 5000, -7)) == sl[9999:5000:-7]
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense', 'chunked'])
+    def test_long_slice_scans_populated_indices(self, storage):
+        sl = sparse_list.SparseList(10 ** 6, 0, storage=storage)
+        sl.update([(3, 1), (500000, 2), (999999, 3)])
+        assert [0] * 250000 + [2] + [0] * 249999 == sl[250000:750000]
+        assert 3 == sl[::-1][0]
+        assert {0: 3, 333332: 1} == dict(sl[999999::-3].elements.items())
+
+
+def _random_values(rng, count):
+    return [rng.choice([0, 0, 1, 2, 3]) for _ in range(count)]
+
+
+def _random_slice(rng, size):
+    def bound():
+        return rng.choice([None, rng.randint(-size - 3, size + 3)])
+    return slice(bound(), bound(), rng.choice([None, 1, 2, 3, -1, -2, -3]))
+
+
+def _remove(seq, value):
+    '''
+    SparseList.remove() resets the first occurrence of a value to the default
+    rather than shifting everything after it down
+    '''
+    if isinstance(seq, sparse_list.SparseList):
+        return seq.remove(value)
+    if value != 0:
+        seq[seq.index(value)] = 0
+
+
+def _either(sparse, plain):
+    '''
+    return an operation running sparse on a SparseList and plain on a list
+    '''
+    return lambda seq: (sparse if isinstance(seq, sparse_list.SparseList) else plain)(seq)
+
+
+def _set_many(seq, indices, values):
+    '''
+    set a list's elements as SparseList.update_arrays() would, raising
+    IndexError before any is written if an index is out of range
+    '''
+    if any(not -len(seq) <= i < len(seq) for i in indices):
+        raise IndexError('list index out of range')
+    for i, v in zip(indices, values):
+        seq[i] = v
+
+
+def _populated_from(seq, index):
+    if index < 0:
+        index = max(index + len(seq), 0)
+    return next((i for i in range(index, len(seq)) if seq[i]), None)
+
+
+def _random_action(rng, size, sorted_values=False):
+    '''
+    return a random operation, to be applied in turn to a SparseList with a
+    default of 0 and to the list it should match. With sorted_values, only
+    operations that modify the list in place are included among the writes.
+    '''
+    index = rng.randint(-size - 2, size + 1)
+    span = _random_slice(rng, size)
+    span_values = _random_values(rng, len(range(*span.indices(size))))
+    start, stop = (rng.choice([None, rng.randint(-size - 2, size + 2)]) for _ in range(2))
+    value = rng.choice([0, 1, 2, 3])
+    other = _random_values(rng, rng.randint(0, 5))
+    cut = rng.randint(0, size)
+    multiplier = rng.randint(-1, 3)
+    key = rng.choice([None, operator.neg, lambda v: v % 2])
+    descending = rng.random() < 0.5
+    batch = [rng.randint(-size, size - 1) for _ in range(rng.randint(0, 6) if size else 0)]
+    batch_values = _random_values(rng, len(batch))
+    clears = batch + [rng.choice([size, -size - 1])] if rng.random() < 0.2 else batch
+    mask = [rng.random() < 0.5 for _ in range(size)]
+
+    def double_less_two(v):
+        return v * 2 - 2
+
+    def odd(v):
+        return v % 2
+
+    def compare(seq):
+        against = list(seq)[:cut] + other if other else list(seq)
+        return (seq == against, seq != against, seq < against, seq <= against, seq > against, seq >= against)
+
+    actions = [
+        lambda seq: seq[index],
+        lambda seq: seq[span],
+        # unlike a list, a SparseList grows when set past its end
+        lambda seq: seq.__setitem__(index, value) if -size <= index < size else None,
+        lambda seq: seq.__setitem__(span, span_values),
+        lambda seq: seq.__delitem__(index),
+        lambda seq: seq.__delitem__(span),
+        lambda seq: seq.append(value),
+        lambda seq: seq.pop(),
+        lambda seq: seq.extend(other),
+        lambda seq: seq.__iadd__(other),
+        compare,
+        lambda seq: seq.count(value),
+        lambda seq: seq.index(value),
+        lambda seq: value in seq,
+        lambda seq: _remove(seq, value),
+        lambda seq: list(reversed(seq)),
+        lambda seq: seq.reverse(),
+        lambda seq: seq.sort(key=key, reverse=descending),
+        _either(lambda seq: seq.update(zip(batch, batch_values)), lambda seq: _set_many(seq, batch, batch_values)),
+        _either(lambda seq: seq.update_arrays(batch, batch_values), lambda seq: _set_many(seq, batch, batch_values)),
+        _either(lambda seq: seq.clear_many(clears), lambda seq: _set_many(seq, clears, repeat(0))),
+        _either(lambda seq: seq.range_sum(start, stop), lambda seq: sum(seq[start:stop])),
+        _either(lambda seq: seq.range_count(start, stop), lambda seq: len(list(filter(None, seq[start:stop])))),
+        _either(lambda seq: seq.range_min(start, stop), lambda seq: min(filter(None, seq[start:stop]))),
+        _either(lambda seq: seq.range_max(start, stop), lambda seq: max(filter(None, seq[start:stop]))),
+        _either(lambda seq: seq.next_populated(index), lambda seq: _populated_from(seq, index)),
+        _either(lambda seq: seq.map_values(double_less_two).to_sparse_list(),
+                lambda seq: [double_less_two(v) if v else 0 for v in seq]),
+        _either(lambda seq: list(seq.map_values(double_less_two).items()),
+                lambda seq: [(i, double_less_two(v)) for i, v in enumerate(seq) if v]),
+        _either(lambda seq: seq.filter_values(odd).where(mask).to_sparse_list(),
+                lambda seq: [v if odd(v) and mask[i] else 0 for i, v in enumerate(seq)]),
+    ]
+    if sorted_values:
+        actions += [
+            _either(lambda seq: seq.bisect_left(value),
+                    lambda seq: next((i for i, v in enumerate(seq) if v and v >= value), len(seq))),
+            _either(lambda seq: seq.bisect_right(value),
+                    lambda seq: next((i for i, v in enumerate(seq) if v and v > value), len(seq))),
+        ]
+    else:
+        actions += [
+            lambda seq: seq + other,
+            lambda seq: seq * multiplier,
+        ]
+    return rng.choice(actions)
+
+
+def _outcome(action, seq):
+    try:
+        result = action(seq)
+    except (IndexError, ValueError) as e:
+        return type(e)
+    if isinstance(result, (list, sparse_list.SparseList)):
+        return list(result)
+    return result
+
+
+class TestAgainstList:
+    '''
+    Differential tests running random operations on a SparseList and a list
+    in lockstep
+    '''
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense', 'chunked', 'auto'])
+    @pytest.mark.parametrize('typecode', [None, 'q'])
+    @pytest.mark.parametrize('seed', range(10))
+    def test_random_operations(self, storage, typecode, seed):
+        rng = random.Random(seed)
+        expected = _random_values(rng, rng.randint(0, 20))
+        sl = sparse_list.SparseList(expected, 0, storage=storage, typecode=typecode)
+        for step in range(300):
+            action = _random_action(rng, len(expected))
+            assert _outcome(action, sl) == _outcome(action, expected), step
+            assert expected == list(sl)
+            assert len(expected) == len(sl)
+            assert len(expected) - expected.count(0) == sl.population()
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'dense', 'chunked', 'auto'])
+    @pytest.mark.parametrize('seed', range(10))
+    def test_random_operations_with_sorted_values(self, storage, seed):
+        rng = random.Random(seed)
+        expected = [v if rng.random() < 0.5 else 0 for v in sorted(_random_values(rng, rng.randint(0, 20)))]
+        sl = sparse_list.SparseList(expected, 0, storage=storage, sorted_values=True)
+        for step in range(300):
+            action = _random_action(rng, len(expected), sorted_values=True)
+            trial = list(expected)
+            outcome = _outcome(action, trial)
+            populated = list(filter(None, trial))
+            if populated == sorted(populated):
+                assert outcome == _outcome(action, sl), step
+                expected = trial
+            else:
+                # a write that would break the order is refused outright
+                assert ValueError is _outcome(action, sl), step
+            assert expected == list(sl)
+            assert len(expected) - expected.count(0) == sl.population()
+
+    @pytest.mark.parametrize('storage', ['dict', 'bitmap', 'chunked', 'auto'])
+    def test_operations_do_not_scale_with_length(self, storage):
+        def elapsed(size):
+            sl = sparse_list.SparseList(size, 0, storage=storage)
+            sl.update((i, 1) for i in range(0, 300, 3))
+            tail = sparse_list.SparseList([0, 4, 0], 0)
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                for _ in range(100):
+                    sl[5], sl[-1], sl[10:20], 0 in sl, 1 in sl
+                    sl[7] = 2
+                    sl[7] = 0
+                    sl.append(4)
+                    sl.pop()
+                    del sl[50]
+                    sl.append(0)
+                    sl += tail
+                    del sl[-3:]
+                    sl.count(1), sl.index(1), sl.population()
+                    sl.get_many([1, 2, 3]), sl.range_sum(0, 100), sl.next_populated(4)
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        # an operation linear in the length would be a thousand times slower
+        assert elapsed(10 ** 6) < 20 * elapsed(10 ** 3)
+
+    def test_sorted_writes_do_not_scale_with_population(self):
+        def elapsed(population):
+            sl = sparse_list.SparseList(range(1, population + 1), 0, sorted_values=True)
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                for i in range(100):
+                    sl.extend([population + 1])
+                    sl += sparse_list.SparseList([0, population + 2], 0)
+                    sl.update([(len(sl) - 1, population + 3)])
+                    del sl[-3:]
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        assert elapsed(10 ** 5) < 20 * elapsed(10 ** 2)
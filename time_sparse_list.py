@@ -1,9 +1,25 @@
 #!/usr/bin/env python
 
+import array
 import benchmark
+from itertools import repeat
+import pickle
+import random
+import subprocess
+import sys
 import sparse_list
 
 
+class Benchmark_Import(benchmark.Benchmark):
+    each = 10
+
+    def test_sparse_list(self):
+        subprocess.run([sys.executable, '-c', 'import sparse_list'], check=True)
+
+    def test_list(self):
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+
+
 class Benchmark_Repr(benchmark.Benchmark):
     def setUp(self):
         self.sparse_list = sparse_list.SparseList(1000)
@@ -28,6 +44,36 @@ class Benchmark_Insert(benchmark.Benchmark):
         self.list[100] = 'apple'
 
 
+class Benchmark_Batch_Insert(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(1000)
+        self.list = [None] * 1000
+        self.pairs = [(i, 'apple') for i in range(0, 1000, 7)]
+
+    def test_sparse_list(self):
+        self.sparse_list.update(self.pairs)
+
+    def test_list(self):
+        for i, v in self.pairs:
+            self.list[i] = v
+
+
+class Benchmark_Batch_Update(benchmark.Benchmark):
+    each = 10
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.sparse_list = sparse_list.SparseList(10 ** 6, 0)
+        self.pairs = [(rng.randrange(10 ** 6), rng.randint(1, 9)) for _ in range(10 ** 5)]
+
+    def test_update(self):
+        self.sparse_list.update(self.pairs)
+
+    def test_scalar_writes(self):
+        for i, v in self.pairs:
+            self.sparse_list[i] = v
+
+
 class Benchmark_Retrieval(benchmark.Benchmark):
     def setUp(self):
         self.sparse_list = sparse_list.SparseList(1000)
@@ -40,6 +86,57 @@ class Benchmark_Retrieval(benchmark.Benchmark):
         self.list[100]
 
 
+class Benchmark_Batch_Retrieval(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(1000)
+        self.list = [None] * 1000
+        self.indices = list(range(0, 1000, 7))
+
+    def test_sparse_list(self):
+        self.sparse_list.get_many(self.indices)
+
+    def test_list(self):
+        [self.list[i] for i in self.indices]
+
+
+class Benchmark_Typed_Load(benchmark.Benchmark):
+    def setUp(self):
+        self.values = [0.0] * 900 + [1.5] * 100
+
+    def test_sparse_list(self):
+        sparse_list.SparseList(self.values, 0.0)
+
+    def test_typed_sparse_list(self):
+        sparse_list.SparseList(self.values, 0.0, typecode='d')
+
+    def test_list(self):
+        list(self.values)
+
+
+class Benchmark_Range_Sum(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList({i: i for i in range(0, 1000, 10)}, 0)
+        self.list = list(self.sparse_list)
+
+    def test_sparse_list(self):
+        self.sparse_list.range_sum(100, 900)
+
+    def test_list(self):
+        sum(self.list[100:900])
+
+
+class Benchmark_Sorted_Index(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList({i: i for i in range(0, 1000, 10)}, sorted_values=True)
+        self.list = list(self.sparse_list)
+
+    def test_sparse_list(self):
+        self.sparse_list.index(900)
+
+    def test_list(self):
+        self.list.index(900)
+
+
 class Benchmark_Slice_Deletion(benchmark.Benchmark):
     def setUp(self):
         self.sparse_list = sparse_list.SparseList(range(1000))
@@ -64,5 +161,74 @@ class Benchmark_Deletion(benchmark.Benchmark):
         del self.list[100]
 
 
+class Benchmark_Pickle(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(range(1000))
+        self.list = list(range(1000))
+
+    def test_sparse_list(self):
+        pickle.loads(pickle.dumps(self.sparse_list))
+
+    def test_list(self):
+        pickle.loads(pickle.dumps(self.list))
+
+
+class Benchmark_Copy(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(range(1000))
+        self.list = list(range(1000))
+
+    def test_sparse_list(self):
+        self.sparse_list.copy()
+
+    def test_list(self):
+        self.list.copy()
+
+
+class Benchmark_Columnar(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(100000, 0, typecode='d')
+        self.sparse_list.update((i, 1.0) for i in range(0, 100000, 100))
+        self.indices = array.array('q', range(0, 100000, 100))
+        self.values = array.array('d', repeat(1.0, 1000))
+
+    def test_sparse_list_to_dense(self):
+        self.sparse_list.to_dense()
+
+    def test_list_to_dense(self):
+        list(self.sparse_list)
+
+    def test_sparse_list_from_buffers(self):
+        sparse_list.SparseList.from_buffers(self.indices, self.values, size=100000)
+
+
+class Benchmark_Sort(benchmark.Benchmark):
+    def setUp(self):
+        self.sparse_list = sparse_list.SparseList(100000, 0.0)
+        self.sparse_list.update((i, (i * 7919) % 1000 / 10) for i in range(0, 100000, 1000))
+        self.list = list(self.sparse_list)
+
+    def test_sparse_list(self):
+        self.sparse_list.sort(reverse=True)
+
+    def test_list(self):
+        self.list.sort(reverse=True)
+
+
+class Benchmark_Chunked_Slice(benchmark.Benchmark):
+    def setUp(self):
+        clusters = [(base + i, 1) for base in range(0, 10 ** 10, 10 ** 8) for i in range(2000)]
+        self.sparse_list = sparse_list.SparseList(10 ** 10, 0)
+        self.sparse_list.update(clusters)
+        self.chunked = sparse_list.SparseList(10 ** 10, 0, storage='chunked')
+        self.chunked.update(clusters)
+
+    def test_sparse_list(self):
+        self.sparse_list[3 * 10 ** 8 - 10 ** 6:3 * 10 ** 8 + 10 ** 6]
+
+    def test_chunked(self):
+        self.chunked[3 * 10 ** 8 - 10 ** 6:3 * 10 ** 8 + 10 ** 6]
+
+
 if __name__ == '__main__':
     benchmark.main(format="markdown", numberFormat="%.4g")